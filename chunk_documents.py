@@ -47,9 +47,9 @@ def extract_text_from_file(file_path):
         return ""
 
 # === CHUNKING STRATEGIES ===
-def llm_chunk(text, prompt_template):
+def llm_chunk(text, prompt_template, llm_client=None):
     prompt = prompt_template.format(text=text)
-    response = client.chat.completions.create(
+    response = (llm_client or client).chat.completions.create(
         model="gpt-4o",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.3
@@ -70,7 +70,7 @@ def sentence_chunk(text, max_sentences):
 def heading_chunk(text, heading_level="#"):
     return [s.strip() for s in re.split(rf"\n{re.escape(heading_level)}+", text) if s.strip()]
 
-def csv_row_chunk(file_path):
+def csv_row_chunk(file_path, chunks_dir=CHUNKS_DIR):
     """Chunk a CSV file so each row is a pretty-printed .txt file with field names and values."""
     base_name = Path(file_path).stem
     with open(file_path, newline='', encoding='utf-8') as csvfile:
@@ -79,26 +79,26 @@ def csv_row_chunk(file_path):
             pretty_lines = [f"{field}: {row[field]}" for field in reader.fieldnames]
             pretty_content = "\n".join(pretty_lines)
             chunk_filename = f"{base_name}_chunk_{i:03}.txt"
-            with open(os.path.join(CHUNKS_DIR, chunk_filename), "w", encoding="utf-8") as f:
+            with open(os.path.join(chunks_dir, chunk_filename), "w", encoding="utf-8") as f:
                 f.write(pretty_content)
 
 # === SAVE CHUNKS ===
-def save_chunks(chunks, source_filename):
+def save_chunks(chunks, source_filename, chunks_dir=CHUNKS_DIR):
     base_name = Path(source_filename).stem
     for i, chunk in enumerate(chunks):
         chunk_filename = f"{base_name}_chunk_{i:03}.txt"
-        with open(os.path.join(CHUNKS_DIR, chunk_filename), "w") as f:
+        with open(os.path.join(chunks_dir, chunk_filename), "w") as f:
             f.write(chunk.strip())
 
 # === MAIN ===
-def chunk_file(file_path, method, **kwargs):
+def chunk_file(file_path, method, chunks_dir=CHUNKS_DIR, **kwargs):
     text = extract_text_from_file(file_path)
     if not text.strip():
         print(f"Skipped empty or unsupported file: {file_path}")
         return
 
     if method == "llm":
-        chunks = llm_chunk(text, kwargs.get("llm_prompt"))
+        chunks = llm_chunk(text, kwargs.get("llm_prompt"), kwargs.get("llm_client"))
     elif method == "fixed":
         chunks = fixed_chunk(text, kwargs.get("chunk_size", 300), kwargs.get("overlap", 0))
     elif method == "sentence":
@@ -106,20 +106,34 @@ def chunk_file(file_path, method, **kwargs):
     elif method == "heading":
         chunks = heading_chunk(text, kwargs.get("heading_level", "#"))
     elif method == "csv-row":
-        csv_row_chunk(file_path)
+        csv_row_chunk(file_path, chunks_dir)
         return
     else:
         raise ValueError(f"Unknown chunking method: {method}")
 
-    save_chunks(chunks, os.path.basename(file_path))
+    save_chunks(chunks, os.path.basename(file_path), chunks_dir)
     print(f"✅ Chunked {file_path} into {len(chunks)} chunks")
 
-def has_been_chunked(file_path):
+def has_been_chunked(file_path, chunks_dir=CHUNKS_DIR):
     base_name = Path(file_path).stem
     # Look for any chunk files that start with this base name
-    chunk_files = list(Path(CHUNKS_DIR).glob(f"{base_name}_chunk_*.txt"))
+    chunk_files = list(Path(chunks_dir).glob(f"{base_name}_chunk_*.txt"))
     return len(chunk_files) > 0
 
+def chunk_folder(input_folder, method, chunks_dir=CHUNKS_DIR, **kwargs):
+    """Chunk every supported document in `input_folder` that has not been chunked yet"""
+    os.makedirs(chunks_dir, exist_ok=True)
+    for file in sorted(Path(input_folder).iterdir()):
+        if file.suffix.lower() in [".pdf", ".docx", ".txt", ".md", ".csv", ".json"]:
+            if has_been_chunked(file, chunks_dir):
+                print(f"⏭️ Skipping already chunked document: {file.name}")
+                continue
+            if file.suffix.lower() == ".csv" and method == "csv-row":
+                csv_row_chunk(str(file), chunks_dir)
+                print(f"✅ Chunked {file} into pretty-printed row chunks")
+            else:
+                chunk_file(str(file), method=method, chunks_dir=chunks_dir, **kwargs)
+
 # === CLI ===
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Chunk documents for embedding.")
@@ -153,22 +167,12 @@ if __name__ == "__main__":
             print("Enter your custom prompt (use {text} where the document should be inserted):")
             args.llm_prompt = input("Prompt: ")
 
-    chunk_files = sorted(Path(CHUNKS_DIR).glob("*.txt"))
-    for file in Path(args.input_folder).iterdir():
-        if file.suffix.lower() in [".pdf", ".docx", ".txt", ".md", ".csv", ".json"]:
-            if has_been_chunked(file):
-                print(f"⏭️ Skipping already chunked document: {file.name}")
-                continue
-            if file.suffix.lower() == ".csv" and args.method == "csv-row":
-                csv_row_chunk(str(file))
-                print(f"✅ Chunked {file} into pretty-printed row chunks")
-            else:
-                chunk_file(
-                    str(file),
-                    method=args.method,
-                    chunk_size=args.chunk_size,
-                    max_sentences=args.max_sentences,
-                    heading_level=args.heading_level,
-                    overlap=args.overlap,
-                    llm_prompt=args.llm_prompt
-                )
\ No newline at end of file
+    chunk_folder(
+        args.input_folder,
+        method=args.method,
+        chunk_size=args.chunk_size,
+        max_sentences=args.max_sentences,
+        heading_level=args.heading_level,
+        overlap=args.overlap,
+        llm_prompt=args.llm_prompt
+    )
@@ -16,11 +16,18 @@ import openai
 from openai import OpenAI
 from pinecone import Pinecone
 
+import argparse
+import sys
+
+import pinecone_batch
+from ingest_jobs import IngestJob
+from workspaces import default_namespace, workspace
+
 # === CONFIG ===
-CHUNKS_DIR = "chunks"
-METADATA_DIR = "metadata"
 PINECONE_INDEX = os.getenv("PINECONE_INDEX")
 EMBEDDING_MODEL = "text-embedding-3-large"
+BATCH_SIZE = 100  # Chunks embedded and upserted per journal batch
+MODES = ["none", "incremental", "full"]
 
 # === INIT PINECONE ===
 pc = Pinecone(
@@ -29,123 +36,252 @@ pc = Pinecone(
 )
 index = pc.Index(os.getenv("PINECONE_INDEX"))
 
+# === INIT OPENAI ===
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
 # === LOAD + EMBED + UPSERT ===
-def process_and_upsert(chunk_path):
-    chunk_id = chunk_path.stem
-    print(f"🔍 Processing chunk: {chunk_id}")
-    metadata_path = Path(METADATA_DIR) / f"{chunk_id}.json"
-    print(f"📄 Looking for metadata at: {metadata_path}")
+def load_chunk(chunk_id, ws):
+    """Return (text, metadata) ready for upserting, or None if either file is missing"""
+    chunk_path = Path(ws.chunks_dir) / f"{chunk_id}.txt"
+    metadata_path = Path(ws.metadata_dir) / f"{chunk_id}.json"
+    if not chunk_path.exists() or not metadata_path.exists():
+        return None
 
     chunk_text = chunk_path.read_text()
-
-    # Load metadata
-    if not metadata_path.exists():
-        print(f"⚠️ Metadata not found for: {chunk_id}")
-        return
-
     with open(metadata_path, "r") as f:
         metadata = json.load(f)
-    
+
     # Add additional metadata fields for RAG applications
     metadata.update({
         "text": chunk_text,  # Ensure the full text is in metadata for retrieval
         "embedding_model": EMBEDDING_MODEL,
         "embedded_at": datetime.utcnow().isoformat()
     })
-    
-    print(f"📦 Loaded metadata: {metadata}")
-
-    # Set OpenAI API key
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    print("🧠 Requesting embedding from OpenAI...")
-    # Embed text
-    embedding_response = client.embeddings.create(
-        input=chunk_text,
-        model=EMBEDDING_MODEL
-    )
-    embedding = embedding_response.data[0].embedding
-    print(f"✅ Received embedding of length: {len(embedding)}")
-
-    print(f"📤 Upserting to Pinecone index: {PINECONE_INDEX}")
-    # Upsert to Pinecone
+    return chunk_text, metadata
+
+def process_batch(job, chunk_ids, ws, llm_client=None):
+    """Embed and upsert a batch of claimed chunks, then record them in the log and journal"""
+    texts = []
+    vectors_metadata = []
+    ready_ids = []
+    missing = []
+    for chunk_id in chunk_ids:
+        loaded = load_chunk(chunk_id, ws)
+        if loaded is None:
+            print(f"⚠️ Chunk or metadata not found for: {chunk_id}")
+            missing.append(chunk_id)
+            continue
+
+        chunk_text, metadata = loaded
+        texts.append(chunk_text)
+        vectors_metadata.append(metadata)
+        ready_ids.append(chunk_id)
+
+    if missing:
+        job.mark_skipped(missing, "chunk or metadata file not found")
+    if not ready_ids:
+        return
+
     try:
-        index.upsert([
-            (chunk_id, embedding, metadata)
-        ], namespace=namespace)
-        print(f"✅ Upserted: {chunk_id}")
+        print(f"🧠 Requesting {len(texts)} embedding(s) from OpenAI...")
+        embeddings = pinecone_batch.embed_texts(llm_client or client, texts, EMBEDDING_MODEL)
+        print(f"📤 Upserting {len(ready_ids)} chunk(s) to Pinecone index {PINECONE_INDEX}, namespace {job.namespace}")
+        pinecone_batch.upsert_vectors(index, list(zip(ready_ids, embeddings, vectors_metadata)), job.namespace)
     except Exception as e:
-        print(f"❌ Failed to upsert {chunk_id}: {e}")
+        print(f"❌ Failed to embed/upsert batch starting at {ready_ids[0]}: {e}")
+        job.mark_failed(ready_ids, str(e))
         return
 
-    log_chunk(chunk_id, metadata.get("source_file", "unknown"))
+    log_chunks([(chunk_id, metadata.get("source_file", "unknown"), pinecone_batch.text_hash(text))
+                for chunk_id, metadata, text in zip(ready_ids, vectors_metadata, texts)], job.namespace, ws.chunk_log)
+    job.mark_done(ready_ids)
+    print(f"✅ Upserted: {', '.join(ready_ids)}")
 
-def log_chunk(chunk_id, source_file):
-    conn = sqlite3.connect("chunklog.db")
-    cursor = conn.cursor()
+def embedded_since(vector, claimed_at):
+    embedded_at = (vector.metadata or {}).get("embedded_at")
+    return bool(embedded_at) and datetime.fromisoformat(embedded_at) >= datetime.fromisoformat(claimed_at)
+
+def upserted_chunk_ids(job, claimed_at, ws):
+    """Chunks from an interrupted batch that reached Pinecone; logs them so they are not redone.
+
+    A vector only counts if it was embedded after the chunk was claimed. Older
+    vectors with the same id (from earlier runs) do not.
+    """
+    vectors = pinecone_batch.fetch_vectors(index, list(claimed_at), job.namespace)
+    found = [chunk_id for chunk_id, vector in vectors.items() if embedded_since(vector, claimed_at[chunk_id])]
+    if found:
+        entries = []
+        for chunk_id in found:
+            metadata_path = Path(ws.metadata_dir) / f"{chunk_id}.json"
+            source_file = "unknown"
+            if metadata_path.exists():
+                with open(metadata_path, "r") as f:
+                    source_file = json.load(f).get("source_file", "unknown")
+            # Hash the text the vector was actually embedded from
+            text = (vectors[chunk_id].metadata or {}).get("text")
+            entries.append((chunk_id, source_file, pinecone_batch.text_hash(text) if text is not None else None))
+        log_chunks(entries, job.namespace, ws.chunk_log)
+    return found
+
+def delete_stale_vectors(job, ws):
+    """After a full rebuild, delete vectors that were not rebuilt and have no local chunk"""
+    keep = set(job.items("done")) | {path.stem for path in Path(ws.chunks_dir).glob("*.txt")}
+    try:
+        stale = sorted(pinecone_batch.list_ids(index, job.namespace) - keep)
+        if stale:
+            calls = pinecone_batch.delete_ids(index, stale, job.namespace)
+            print(f"🧹 Deleted {len(stale)} stale vector(s) from namespace '{job.namespace}' in {calls} call(s)")
+    except Exception as e:
+        print(f"⚠️ Could not remove stale vectors from '{job.namespace}': {e}")
+        print("   Run reconcile.py to clean them up.")
+    prune_chunk_log(keep, ws.chunk_log)
+
+def finish_job(job, ws):
+    """Complete a job whose items are all processed, cleaning up after full rebuilds"""
+    if job.mode == "full":
+        delete_stale_vectors(job, ws)
+    abandoned = job.items("abandoned")
+    if abandoned:
+        print(f"⚠️ Gave up on {len(abandoned)} chunk(s) after repeated failures: {', '.join(abandoned[:5])}"
+              + (" ..." if len(abandoned) > 5 else ""))
+    job.finish()
+    print(f"🏁 Job {job.job_id} complete: {job.counts()}")
+
+def ensure_chunk_log_table(cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS chunks (
             chunk_id TEXT PRIMARY KEY,
             source_file TEXT,
-            embedded_at TEXT
+            embedded_at TEXT,
+            namespace TEXT DEFAULT 'default',
+            text_hash TEXT
         )
     """)
-    cursor.execute("""
-        INSERT OR IGNORE INTO chunks (chunk_id, source_file, embedded_at)
-        VALUES (?, ?, ?)
-    """, (chunk_id, source_file, datetime.utcnow().isoformat()))
+    # Add columns that older logs lack (for backward compatibility)
+    cursor.execute("PRAGMA table_info(chunks)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'namespace' not in columns:
+        cursor.execute("ALTER TABLE chunks ADD COLUMN namespace TEXT DEFAULT 'default'")
+    if 'text_hash' not in columns:
+        cursor.execute("ALTER TABLE chunks ADD COLUMN text_hash TEXT")
+
+def log_chunks(entries, namespace="default", db_path="chunklog.db"):
+    """Log many (chunk_id, source_file, text_hash) entries in one transaction; text_hash may be None"""
+    embedded_at = datetime.utcnow().isoformat()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    ensure_chunk_log_table(cursor)
+    cursor.executemany("""
+        INSERT OR REPLACE INTO chunks (chunk_id, source_file, embedded_at, namespace, text_hash)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(chunk_id, source_file, embedded_at, namespace, text_hash) for chunk_id, source_file, text_hash in entries])
     conn.commit()
     conn.close()
 
-def is_chunk_logged(chunk_id):
-    if not os.path.exists("chunklog.db"):
-        return False
-    conn = sqlite3.connect("chunklog.db")
+def prune_chunk_log(keep_ids, db_path="chunklog.db"):
+    """Drop log entries for chunks that are not part of a completed full rebuild"""
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM chunks WHERE chunk_id = ?", (chunk_id,))
-    result = cursor.fetchone()
+    ensure_chunk_log_table(cursor)
+    cursor.execute("CREATE TEMP TABLE keep (chunk_id TEXT PRIMARY KEY)")
+    cursor.executemany("INSERT INTO keep VALUES (?)", [(chunk_id,) for chunk_id in keep_ids])
+    cursor.execute("DELETE FROM chunks WHERE chunk_id NOT IN (SELECT chunk_id FROM keep)")
+    conn.commit()
     conn.close()
-    return result is not None
 
-if __name__ == "__main__":
-    namespace = input("Enter namespace for Pinecone (default is 'default'): ").strip() or "default"
-    print(f"📛 Using namespace: {namespace}")
+def logged_chunk_ids(db_path="chunklog.db"):
+    if not os.path.exists(db_path):
+        return set()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    ensure_chunk_log_table(cursor)
+    cursor.execute("SELECT chunk_id FROM chunks")
+    result = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    return result
+
+def run_job(job, ws, llm_client=None):
+    """Process every pending item of a job in batches"""
+    job.recover(lambda claimed_at: upserted_chunk_ids(job, claimed_at, ws))
+    print(f"📋 Job {job.job_id} ({job.mode}) -> namespace '{job.namespace}': {job.counts()}")
+
+    while True:
+        chunk_ids = job.claim(BATCH_SIZE)
+        if not chunk_ids:
+            break
+        process_batch(job, chunk_ids, ws, llm_client)
 
-    print("Select upsert mode:")
-    print("1. None (embed everything)")
-    print("2. Incremental (skip logged chunks)")
-    print("3. Full (clear Pinecone and log, then re-embed)")
-    mode_input = input("Enter number: ").strip()
-
-    if mode_input == "1":
-        mode = "none"
-    elif mode_input == "2":
-        mode = "incremental"
-    elif mode_input == "3":
-        mode = "full"
+    if job.is_complete():
+        finish_job(job, ws)
     else:
-        print("Invalid input. Defaulting to 'none'")
-        mode = "none"
+        print(f"⚠️ Job {job.job_id} has unfinished items {job.counts()}; run again to retry them")
+    return job
+
+def embed_namespace(namespace, mode, llm_client=None):
+    """Embed and upsert a namespace's workspace, resuming its interrupted job if there is one"""
+    ws = workspace(namespace)
+    job = IngestJob.find_running("embed", namespace)
+    if job and mode and mode != job.mode:
+        raise ValueError(f"Namespace '{namespace}' has an unfinished '{job.mode}' job {job.job_id}; "
+                         f"run it again with mode '{job.mode}' to finish it before starting a '{mode}' run")
+    if job:
+        print(f"♻️ Resuming interrupted '{job.mode}' job {job.job_id}")
+        # Pick up chunks added since the job started; finished items are kept
+        if job.mode != "incremental":
+            job.add_items(path.stem for path in sorted(Path(ws.chunks_dir).glob("*.txt")))
+        return run_job(job, ws, llm_client)
 
     print(f"🚀 Running in '{mode}' mode")
-    print(f"📁 Scanning chunks in: {CHUNKS_DIR}")
-
-    if mode == "full":
-        print("🧹 Clearing Pinecone index and chunk log...")
-        try:
-            index.delete(delete_all=True, namespace=namespace)
-            print(f"✅ Successfully cleared namespace '{namespace}'")
-        except Exception as e:
-            print(f"❌ Failed to clear namespace '{namespace}': {e}")
-        if os.path.exists("chunklog.db"):
-            os.remove("chunklog.db")
-
-    chunk_files = sorted(Path(CHUNKS_DIR).glob("*.txt"))
+    print(f"📁 Scanning chunks in: {ws.chunks_dir}")
+
+    chunk_files = sorted(Path(ws.chunks_dir).glob("*.txt"))
     print(f"📝 Found {len(chunk_files)} chunk(s) to process")
     if not chunk_files:
         print("⚠️ No chunks found in chunks directory.")
+
+    logged = logged_chunk_ids(ws.chunk_log) if mode == "incremental" else set()
+    chunk_ids = []
     for chunk_path in chunk_files:
-        if mode == "incremental" and is_chunk_logged(chunk_path.stem):
+        if chunk_path.stem in logged:
             print(f"⏭️ Skipping (already embedded): {chunk_path.stem}")
             continue
-        process_and_upsert(chunk_path)
\ No newline at end of file
+        chunk_ids.append(chunk_path.stem)
+
+    job = IngestJob.create("embed", namespace, mode, chunk_ids)
+    return run_job(job, ws, llm_client)
+
+# === CLI ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed chunks and upsert them to Pinecone.")
+    parser.add_argument("--namespace", type=str, help="Pinecone namespace (prompted for if omitted)")
+    parser.add_argument("--mode", type=str, choices=MODES, help="Upsert mode (prompted for if omitted)")
+    args = parser.parse_args()
+
+    namespace = args.namespace
+    if namespace is None:
+        namespace = input(f"Enter namespace for Pinecone (default is '{default_namespace()}'): ").strip() or default_namespace()
+    print(f"📛 Using namespace: {namespace}")
+
+    mode = args.mode
+    if mode is None and IngestJob.find_running("embed", namespace) is None:
+        print("Select upsert mode:")
+        print("1. None (embed everything)")
+        print("2. Incremental (skip logged chunks)")
+        print("3. Full (re-embed everything, then delete stale vectors)")
+        mode_input = input("Enter number: ").strip()
+
+        if mode_input == "1":
+            mode = "none"
+        elif mode_input == "2":
+            mode = "incremental"
+        elif mode_input == "3":
+            mode = "full"
+        else:
+            print("Invalid input. Defaulting to 'none'")
+            mode = "none"
+
+    try:
+        embed_namespace(namespace, mode)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -8,6 +8,8 @@ from datetime import datetime
 from openai import OpenAI
 import tiktoken
 
+from ingest_jobs import IngestJob
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # === CONFIG ===
@@ -22,7 +24,7 @@ def count_tokens(text):
     return len(encoding.encode(text))
 
 # === LLM-BASED METADATA GENERATION ===
-def generate_summary_and_tags(text):
+def generate_summary_and_tags(text, llm_client=None):
     prompt = f"""
 Text:
 \"\"\"{text}\"\"\"
@@ -33,7 +35,7 @@ Format the output as:
 Summary: <summary sentence>
 Tags: <tag1>, <tag2>, <tag3>, ...
 """
-    response = client.chat.completions.create(
+    response = (llm_client or client).chat.completions.create(
         model="gpt-4o",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.3
@@ -49,12 +51,12 @@ Tags: <tag1>, <tag2>, <tag3>, ...
     return summary, tags
 
 # === METADATA GENERATION ===
-def process_chunk_file(file_path):
+def process_chunk_file(file_path, metadata_dir=METADATA_DIR, llm_client=None):
     chunk_text = Path(file_path).read_text()
     chunk_filename = Path(file_path).name
     base_name = chunk_filename.replace(".txt", "")
     
-    summary, tags = generate_summary_and_tags(chunk_text)
+    summary, tags = generate_summary_and_tags(chunk_text, llm_client)
     
     metadata = {
         "chunk_id": base_name,
@@ -68,22 +70,64 @@ def process_chunk_file(file_path):
         "created_at": datetime.utcnow().isoformat()
     }
 
-    # Save JSON
-    metadata_path = os.path.join(METADATA_DIR, f"{base_name}.json")
-    with open(metadata_path, "w") as f:
+    # Save JSON atomically so an interrupted run never leaves a partial file
+    # that `has_metadata` would mistake for a finished chunk
+    metadata_path = os.path.join(metadata_dir, f"{base_name}.json")
+    tmp_path = f"{metadata_path}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path)
     print(f"✅ Metadata saved: {metadata_path}")
 
-def has_metadata(chunk_path):
+def has_metadata(chunk_path, metadata_dir=METADATA_DIR):
     base_name = Path(chunk_path).stem
-    metadata_path = Path(METADATA_DIR) / f"{base_name}.json"
+    metadata_path = Path(metadata_dir) / f"{base_name}.json"
     return metadata_path.exists()
 
-# === MAIN ===
-if __name__ == "__main__":
-    chunk_files = sorted(Path(CHUNKS_DIR).glob("*.txt"))
+def generate_all(chunks_dir=CHUNKS_DIR, metadata_dir=METADATA_DIR, llm_client=None):
+    """Generate metadata for every chunk that lacks it, as a resumable journaled job"""
+    os.makedirs(metadata_dir, exist_ok=True)
+    chunk_files = sorted(Path(chunks_dir).glob("*.txt"))
+    pending = []
     for file_path in chunk_files:
-        if has_metadata(file_path):
+        if has_metadata(file_path, metadata_dir):
             print(f"⏭️ Skipping already processed chunk: {Path(file_path).name}")
             continue
-        process_chunk_file(file_path)
\ No newline at end of file
+        pending.append(file_path.stem)
+
+    # Journal the run so a restart resumes without repeating LLM calls
+    job = IngestJob.find_running("metadata", metadata_dir)
+    if job:
+        print(f"♻️ Resuming interrupted metadata job {job.job_id}")
+        job.add_items(pending)
+    else:
+        job = IngestJob.create("metadata", metadata_dir, "incremental", pending)
+    job.recover(lambda chunk_ids: [c for c in chunk_ids if has_metadata(Path(chunks_dir) / f"{c}.txt", metadata_dir)])
+
+    while True:
+        claimed = job.claim(1)
+        if not claimed:
+            break
+        chunk_id = claimed[0]
+        file_path = Path(chunks_dir) / f"{chunk_id}.txt"
+        if not file_path.exists():
+            job.mark_skipped(claimed, "chunk file not found")
+            continue
+        try:
+            process_chunk_file(file_path, metadata_dir, llm_client)
+        except Exception as e:
+            print(f"❌ Failed to generate metadata for {chunk_id}: {e}")
+            job.mark_failed(claimed, str(e))
+            continue
+        job.mark_done(claimed)
+
+    if job.is_complete():
+        job.finish()
+        print(f"🏁 Metadata job {job.job_id} complete: {job.counts()}")
+    else:
+        print(f"⚠️ Metadata job {job.job_id} has unfinished items {job.counts()}; run again to retry them")
+    return job
+
+# === MAIN ===
+if __name__ == "__main__":
+    generate_all()
@@ -0,0 +1,205 @@
+"""
+Durable journal for resumable ingestion jobs.
+
+Each run of `embed_upsert.py` or `generate_metadata.py` is recorded as a job in
+`ingestjobs.db`, with one row per work item (a chunk id) in the state
+`pending`, `in_flight`, `done`, `failed`, `skipped` or `abandoned`. Items are
+claimed in batches and marked done only after their side effects are complete,
+so a killed run can be restarted and picks up where it stopped. An item that
+keeps failing is abandoned after `MAX_ATTEMPTS` claims so the job can finish.
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+
+# === CONFIG ===
+JOBS_DB = "ingestjobs.db"
+MAX_ATTEMPTS = 3  # Claims per item (failed or interrupted) before it is abandoned
+
+
+def _connect(db_path=JOBS_DB):
+    # Several namespaces may be ingesting at once; wait for the write lock
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            namespace TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            created_at TEXT,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_items (
+            job_id INTEGER NOT NULL,
+            item_id TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (job_id, item_id)
+        )
+    """)
+    return conn
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+# === JOBS ===
+class IngestJob:
+    """A journaled ingestion job. Use `find_running` or `create` to get one."""
+
+    def __init__(self, job_id, kind, namespace, mode, db_path=JOBS_DB):
+        self.job_id = job_id
+        self.kind = kind
+        self.namespace = namespace
+        self.mode = mode
+        self.db_path = db_path
+
+    @classmethod
+    def find_running(cls, kind, namespace, db_path=JOBS_DB):
+        """Return the most recent unfinished job of this kind for `namespace`, if any."""
+        if not os.path.exists(db_path):
+            return None
+        conn = _connect(db_path)
+        row = conn.execute("""
+            SELECT job_id, kind, namespace, mode
+            FROM jobs WHERE kind = ? AND namespace = ? AND status = 'running'
+            ORDER BY job_id DESC LIMIT 1
+        """, (kind, namespace)).fetchone()
+        conn.close()
+        return cls(*row, db_path=db_path) if row else None
+
+    @classmethod
+    def create(cls, kind, namespace, mode, item_ids, db_path=JOBS_DB):
+        """Start a new job over `item_ids`."""
+        conn = _connect(db_path)
+        cursor = conn.execute("""
+            INSERT INTO jobs (kind, namespace, mode, status, created_at, updated_at)
+            VALUES (?, ?, ?, 'running', ?, ?)
+        """, (kind, namespace, mode, _now(), _now()))
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        job = cls(job_id, kind, namespace, mode, db_path=db_path)
+        job.add_items(item_ids)
+        return job
+
+    def add_items(self, item_ids):
+        """Add work items; items already in the journal keep their state."""
+        conn = _connect(self.db_path)
+        conn.executemany("""
+            INSERT OR IGNORE INTO job_items (job_id, item_id, state, updated_at)
+            VALUES (?, ?, 'pending', ?)
+        """, [(self.job_id, item_id, _now()) for item_id in item_ids])
+        conn.commit()
+        conn.close()
+
+    def _set_state(self, item_ids, state, error=None):
+        conn = _connect(self.db_path)
+        conn.executemany("""
+            UPDATE job_items SET state = ?, error = ?, updated_at = ?
+            WHERE job_id = ? AND item_id = ?
+        """, [(state, error, _now(), self.job_id, item_id) for item_id in item_ids])
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (_now(), self.job_id))
+        conn.commit()
+        conn.close()
+
+    def items(self, state):
+        conn = _connect(self.db_path)
+        rows = conn.execute(
+            "SELECT item_id FROM job_items WHERE job_id = ? AND state = ? ORDER BY item_id",
+            (self.job_id, state)
+        ).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def counts(self):
+        conn = _connect(self.db_path)
+        rows = conn.execute(
+            "SELECT state, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY state", (self.job_id,)
+        ).fetchall()
+        conn.close()
+        return dict(rows)
+
+    def claimed_at(self):
+        """{item_id: claim time} of the items currently in flight"""
+        conn = _connect(self.db_path)
+        rows = conn.execute(
+            "SELECT item_id, updated_at FROM job_items WHERE job_id = ? AND state = 'in_flight'",
+            (self.job_id,)
+        ).fetchall()
+        conn.close()
+        return dict(rows)
+
+    def recover(self, completed_ids):
+        """Prepare a resumed job to run again.
+
+        `completed_ids` is called with {item_id: claim time} for the items left
+        `in_flight` by the previous run and returns those whose side effects
+        happened after they were claimed; they are marked done and the rest go
+        back to pending, along with failed items. Items that are out of
+        attempts are abandoned instead.
+        """
+        in_flight = self.claimed_at()
+        if in_flight:
+            completed = set(completed_ids(in_flight))
+            self.mark_done([item_id for item_id in in_flight if item_id in completed])
+            self._set_state([item_id for item_id in in_flight if item_id not in completed], "pending")
+        failed = self.items("failed")
+        if failed:
+            self._set_state(failed, "pending")
+        self._abandon_exhausted("pending")
+
+    def _abandon_exhausted(self, state):
+        conn = _connect(self.db_path)
+        conn.execute("""
+            UPDATE job_items SET state = 'abandoned', updated_at = ?
+            WHERE job_id = ? AND state = ? AND attempts >= ?
+        """, (_now(), self.job_id, state, MAX_ATTEMPTS))
+        conn.commit()
+        conn.close()
+
+    def claim(self, batch_size):
+        """Move up to `batch_size` pending items to in_flight and return their ids."""
+        conn = _connect(self.db_path)
+        rows = conn.execute("""
+            SELECT item_id FROM job_items WHERE job_id = ? AND state = 'pending'
+            ORDER BY item_id LIMIT ?
+        """, (self.job_id, batch_size)).fetchall()
+        item_ids = [row[0] for row in rows]
+        conn.executemany("""
+            UPDATE job_items SET state = 'in_flight', attempts = attempts + 1, updated_at = ?
+            WHERE job_id = ? AND item_id = ?
+        """, [(_now(), self.job_id, item_id) for item_id in item_ids])
+        conn.commit()
+        conn.close()
+        return item_ids
+
+    def mark_done(self, item_ids):
+        self._set_state(item_ids, "done")
+
+    def mark_skipped(self, item_ids, reason):
+        self._set_state(item_ids, "skipped", error=reason)
+
+    def mark_failed(self, item_ids, error):
+        self._set_state(item_ids, "failed", error=error)
+        self._abandon_exhausted("failed")
+
+    def is_complete(self):
+        counts = self.counts()
+        return not any(counts.get(state) for state in ("pending", "in_flight", "failed"))
+
+    def finish(self):
+        conn = _connect(self.db_path)
+        conn.execute(
+            "UPDATE jobs SET status = 'completed', updated_at = ? WHERE job_id = ?", (_now(), self.job_id)
+        )
+        conn.commit()
+        conn.close()
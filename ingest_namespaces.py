@@ -0,0 +1,144 @@
+"""
+Non-interactive, parallel ingestion of several namespaces.
+
+Takes a mapping of document folders to Pinecone namespaces and runs the full
+pipeline (chunk -> metadata -> embed/upsert) for each namespace concurrently.
+Each namespace has its own workspace (chunks, metadata, chunk log) and its own
+resumable journal job. All of them share one OpenAI request budget that is
+handed out round-robin, so no namespace starves the others.
+
+    python ingest_namespaces.py --map documents/acme=acme --map documents/globex=globex
+    python ingest_namespaces.py --config namespaces.json --mode incremental --rpm 3000
+
+`namespaces.json` is an object of folder -> namespace.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from openai import OpenAI
+
+import chunk_documents
+import embed_upsert
+import generate_metadata
+from rate_budget import BudgetedOpenAI, FairRateLimiter
+from workspaces import is_valid_namespace, workspace
+
+# === CONFIG ===
+DEFAULT_RPM = 3000  # Shared OpenAI requests per minute across all namespaces
+
+def parse_mapping(args):
+    """Build {folder: namespace} from --config and --map arguments"""
+    mapping = {}
+    if args.config:
+        with open(args.config, "r") as f:
+            mapping.update(json.load(f))
+    for entry in args.map or []:
+        folder, sep, namespace = entry.rpartition("=")
+        if not sep or not folder:
+            raise ValueError(f"Expected FOLDER=NAMESPACE, got {entry!r}")
+        mapping[folder] = namespace
+
+    seen = {}
+    for folder, namespace in mapping.items():
+        if not is_valid_namespace(namespace):
+            raise ValueError(f"Invalid namespace name {namespace!r} for {folder}")
+        if not Path(folder).is_dir():
+            raise ValueError(f"Document folder not found: {folder}")
+        if namespace in seen:
+            # Two pipelines writing the same workspace and journal would trample each other
+            raise ValueError(f"Namespace {namespace!r} is mapped from both {seen[namespace]} and {folder}")
+        seen[namespace] = folder
+    return mapping
+
+def ingest_namespace(folder, namespace, mode, llm_client, chunk_options):
+    """Run chunk -> metadata -> embed for one namespace and return its job counts"""
+    ws = workspace(namespace, create=True)
+    started = time.monotonic()
+
+    print(f"[{namespace}] ✂️ Chunking {folder} into {ws.chunks_dir}")
+    chunk_documents.chunk_folder(folder, chunks_dir=ws.chunks_dir, llm_client=llm_client, **chunk_options)
+
+    print(f"[{namespace}] 🏷️ Generating metadata into {ws.metadata_dir}")
+    metadata_job = generate_metadata.generate_all(ws.chunks_dir, ws.metadata_dir, llm_client)
+
+    print(f"[{namespace}] 🧠 Embedding and upserting ({mode})")
+    embed_job = embed_upsert.embed_namespace(namespace, mode, llm_client)
+
+    print(f"[{namespace}] 🏁 Finished in {time.monotonic() - started:.1f}s")
+    return {"metadata": metadata_job.counts(), "embed": embed_job.counts(),
+            "complete": metadata_job.is_complete() and embed_job.is_complete()}
+
+# === CLI ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest several document folders into their own Pinecone namespaces in parallel.")
+    parser.add_argument("--config", type=str, help="JSON file mapping document folders to namespaces")
+    parser.add_argument("--map", type=str, action="append", metavar="FOLDER=NAMESPACE", help="Folder to namespace mapping (repeatable)")
+    parser.add_argument("--mode", type=str, choices=embed_upsert.MODES, default="incremental", help="Upsert mode for every namespace")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM, help="Shared OpenAI request budget per minute")
+    parser.add_argument("--parallel", type=int, default=0, help="Max namespaces ingested at once (default: all)")
+    parser.add_argument("--method", type=str, choices=["llm", "fixed", "sentence", "heading", "csv-row"], default="fixed", help="Chunking method to use")
+    parser.add_argument("--chunk_size", type=int, default=300, help="Token size for fixed chunking")
+    parser.add_argument("--max_sentences", type=int, default=5, help="Max sentences per sentence-based chunk")
+    parser.add_argument("--heading_level", type=str, default="#", help="Markdown heading level for heading splitting")
+    parser.add_argument("--overlap", type=int, default=0, help="Token overlap for fixed chunking")
+    parser.add_argument("--llm_prompt", type=str, help="Custom prompt template for LLM chunking. Use {text} as placeholder.")
+    args = parser.parse_args()
+
+    try:
+        mapping = parse_mapping(args)
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if not mapping:
+        print("❌ No folders to ingest. Pass --map FOLDER=NAMESPACE or --config FILE.")
+        sys.exit(1)
+    if args.method == "llm" and not args.llm_prompt:
+        print("❌ --llm_prompt is required with --method llm")
+        sys.exit(1)
+
+    chunk_options = {
+        "method": args.method,
+        "chunk_size": args.chunk_size,
+        "max_sentences": args.max_sentences,
+        "heading_level": args.heading_level,
+        "overlap": args.overlap,
+        "llm_prompt": args.llm_prompt,
+    }
+    limiter = FairRateLimiter(args.rpm)
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    print(f"🚀 Ingesting {len(mapping)} namespace(s) with a shared budget of {args.rpm} requests/min")
+    results = {}
+    with ThreadPoolExecutor(max_workers=args.parallel or len(mapping)) as executor:
+        futures = {
+            executor.submit(ingest_namespace, folder, namespace, args.mode,
+                            BudgetedOpenAI(client, limiter, namespace), chunk_options): namespace
+            for folder, namespace in mapping.items()
+        }
+        for future in as_completed(futures):
+            namespace = futures[future]
+            try:
+                results[namespace] = future.result()
+            except Exception as e:
+                print(f"[{namespace}] ❌ Ingestion failed: {e}")
+                results[namespace] = {"error": str(e), "complete": False}
+
+    print("=" * 50)
+    requests_used = limiter.stats()
+    for namespace in sorted(results):
+        result = results[namespace]
+        status = "✅" if result.get("complete") else "⚠️"
+        detail = result.get("error") or f"metadata {result['metadata']}, embed {result['embed']}"
+        print(f"{status} {namespace}: {detail} ({requests_used.get(namespace, 0)} OpenAI requests)")
+    if not all(result.get("complete") for result in results.values()):
+        print("   Re-run the same command to resume unfinished namespaces.")
+        sys.exit(1)
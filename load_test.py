@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+ChunkMunk Web UI Load Test
+
+Hammers a running web UI with concurrent GET requests and reports throughput
+and latency percentiles. Uses only the standard library.
+
+    python load_test.py --url http://localhost:8080 --concurrency 32 --duration 30
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+DEFAULT_PATHS = ["/", "/search?q=product", "/api/reembed/status"]
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+def discover_chunk_paths(base_url, limit):
+    """Find a few /chunk/<id> pages by scraping links from the index page"""
+    try:
+        with urllib.request.urlopen(f"{base_url}/", timeout=30) as response:
+            html = response.read().decode("utf-8", errors="replace")
+    except urllib.error.URLError as e:
+        print(f"⚠️ Could not load index page to discover chunks: {e}")
+        return []
+    paths = []
+    for part in html.split('href="/chunk/')[1:]:
+        path = "/chunk/" + part.split('"', 1)[0]
+        if path not in paths:
+            paths.append(path)
+        if len(paths) >= limit:
+            break
+    return paths
+
+def worker(base_url, paths, deadline, max_requests, counter, lock, results, conditional, gzip):
+    etags = {}
+    while time.monotonic() < deadline:
+        with lock:
+            if max_requests and counter[0] >= max_requests:
+                return
+            counter[0] += 1
+            n = counter[0]
+        path = paths[n % len(paths)]
+        request = urllib.request.Request(base_url + path)
+        if gzip:
+            request.add_header("Accept-Encoding", "gzip")
+        if conditional and path in etags:
+            request.add_header("If-None-Match", etags[path])
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                status = response.status
+                if response.headers.get("ETag"):
+                    etags[path] = response.headers["ETag"]
+        except urllib.error.HTTPError as e:
+            status = e.code  # urllib raises on 304 as well
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            results.append((path, status, elapsed))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the ChunkMunk web UI.")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Base URL of the running web UI")
+    parser.add_argument("--paths", type=str, nargs="*", help="Paths to request (default: index, search, status and a few chunk pages)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run for")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = no limit)")
+    parser.add_argument("--no-conditional", action="store_true", help="Do not send If-None-Match on repeat requests")
+    parser.add_argument("--no-gzip", action="store_true", help="Do not send Accept-Encoding: gzip")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    paths = args.paths or DEFAULT_PATHS + discover_chunk_paths(base_url, limit=5)
+    print(f"🚀 {args.concurrency} client(s) for {args.duration}s against {base_url}")
+    print(f"   Paths: {', '.join(paths)}")
+
+    results = []
+    lock = threading.Lock()
+    counter = [0]
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(base_url, paths, deadline, args.requests, counter, lock,
+                                              results, not args.no_conditional, not args.no_gzip))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    latencies = sorted(elapsed for _, _, elapsed in results)
+    statuses = Counter(str(status) for _, status, _ in results)
+    errors = sum(count for status, count in statuses.items() if status not in ("200", "304"))
+    summary = {
+        "requests": len(results),
+        "seconds": round(wall, 2),
+        "requests_per_sec": round(len(results) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "errors": errors,
+        "statuses": dict(statuses),
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print("=" * 50)
+    print(f"📊 {summary['requests']} requests in {summary['seconds']}s")
+    print(f"   Throughput: {summary['requests_per_sec']} req/s")
+    print(f"   Latency p50: {summary['p50_ms']} ms  p95: {summary['p95_ms']} ms  p99: {summary['p99_ms']} ms  max: {summary['max_ms']} ms")
+    print(f"   Status codes: {summary['statuses']}")
+    if errors:
+        print(f"❌ {errors} failed request(s)")
+
+if __name__ == "__main__":
+    main()
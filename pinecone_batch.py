@@ -0,0 +1,71 @@
+"""
+Batched OpenAI embedding and Pinecone upsert/delete/fetch helpers.
+
+Every helper takes the client/index it should talk to, so the ingestion
+scripts and the web UI can share them without importing each other.
+"""
+
+import hashlib
+
+# === CONFIG ===
+EMBED_BATCH_SIZE = 256     # Inputs per OpenAI embeddings request
+UPSERT_BATCH_SIZE = 100    # Vectors per Pinecone upsert (3072-dim vectors + metadata stay under 2MB)
+DELETE_BATCH_SIZE = 1000   # Max ids per Pinecone delete
+FETCH_BATCH_SIZE = 100     # Ids per Pinecone fetch (keeps the query string short)
+LIST_PAGE_SIZE = 100       # Max ids per Pinecone list page
+
+
+def text_hash(text):
+    """Hash of a chunk's text, logged at upsert time so drift can be found without fetching vectors."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def batched(items, size):
+    """Yield successive lists of at most `size` items."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def embed_texts(client, texts, model, batch_size=EMBED_BATCH_SIZE):
+    """Embed texts with as few OpenAI requests as possible, preserving order."""
+    embeddings = []
+    for batch in batched(texts, batch_size):
+        response = client.embeddings.create(input=batch, model=model)
+        embeddings.extend(item.embedding for item in sorted(response.data, key=lambda d: d.index))
+    return embeddings
+
+
+def upsert_vectors(index, vectors, namespace, batch_size=UPSERT_BATCH_SIZE):
+    """Upsert (id, values, metadata) tuples in batches. Returns the number of calls made."""
+    calls = 0
+    for batch in batched(vectors, batch_size):
+        index.upsert(vectors=batch, namespace=namespace)
+        calls += 1
+    return calls
+
+
+def delete_ids(index, ids, namespace, batch_size=DELETE_BATCH_SIZE):
+    """Delete vectors by id in batches. Returns the number of calls made."""
+    calls = 0
+    for batch in batched(ids, batch_size):
+        index.delete(ids=batch, namespace=namespace)
+        calls += 1
+    return calls
+
+
+def fetch_vectors(index, ids, namespace, batch_size=FETCH_BATCH_SIZE):
+    """Fetch vectors by id in batches. Returns a dict of id -> vector for ids that exist."""
+    found = {}
+    for batch in batched(ids, batch_size):
+        response = index.fetch(ids=batch, namespace=namespace)
+        found.update(response.vectors)
+    return found
+
+
+def list_ids(index, namespace, page_size=LIST_PAGE_SIZE):
+    """Page through every vector id in a namespace (serverless indexes only)."""
+    ids = set()
+    for page in index.list(namespace=namespace, limit=page_size):
+        ids.update(page)
+    return ids
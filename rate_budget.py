@@ -0,0 +1,80 @@
+"""
+Shared API rate budget for concurrent multi-namespace ingestion.
+
+`FairRateLimiter` is a token bucket that several tenants (namespaces) draw
+from. When more than one tenant is waiting, grants rotate between them, so a
+namespace with a huge backlog cannot starve the others. `BudgetedOpenAI`
+wraps an OpenAI client so every embeddings / chat request takes from the
+budget first, which lets the existing pipeline functions run unchanged.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from types import SimpleNamespace
+
+
+class FairRateLimiter:
+    """Token bucket refilled at `requests_per_minute`, shared round-robin between tenants."""
+
+    def __init__(self, requests_per_minute, burst=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.granted = Counter()
+
+        self._cond = threading.Condition()
+        self._turns = deque()    # tenants with waiters, in the order they get served
+        self._waiters = Counter()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tenant, cost=1):
+        """Block until `tenant` may spend `cost` from the budget."""
+        cost = min(cost, self.capacity)
+        with self._cond:
+            if not self._waiters[tenant]:
+                self._turns.append(tenant)
+            self._waiters[tenant] += 1
+            while True:
+                self._refill()
+                if self._turns[0] == tenant and self.tokens >= cost:
+                    break
+                if self._turns[0] == tenant:
+                    timeout = (cost - self.tokens) / self.rate
+                else:
+                    timeout = None  # Woken when the turn moves on
+                self._cond.wait(timeout)
+
+            self.tokens -= cost
+            self.granted[tenant] += cost
+            self._waiters[tenant] -= 1
+            self._turns.popleft()
+            if self._waiters[tenant]:
+                self._turns.append(tenant)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return dict(self.granted)
+
+
+class BudgetedOpenAI:
+    """OpenAI client proxy that charges `tenant` one request per API call."""
+
+    def __init__(self, client, limiter, tenant):
+        self.embeddings = SimpleNamespace(create=self._budgeted(client.embeddings.create, limiter, tenant))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._budgeted(client.chat.completions.create, limiter, tenant)
+        ))
+
+    @staticmethod
+    def _budgeted(create, limiter, tenant):
+        def wrapper(*args, **kwargs):
+            limiter.acquire(tenant)
+            return create(*args, **kwargs)
+        return wrapper
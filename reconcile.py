@@ -0,0 +1,214 @@
+"""
+Reconcile local chunks, the chunk log and a Pinecone namespace.
+
+Lists every vector id in the namespace in pages, diffs that set against the
+namespace's local chunk files and chunk log in one pass, then repairs the drift:
+missing vectors are embedded and upserted in batches, orphaned vectors are
+deleted in batches, and the log is rewritten to match what Pinecone holds.
+
+Chunk ids are positional (`<source>_chunk_NNN`), so re-chunking a document can
+keep the ids but change the text. Every upsert logs a hash of the chunk text, so
+local chunks are compared with the logged hashes without fetching any vectors,
+and changed chunks are re-embedded along with the missing ones. With
+--check-content the text stored with each vector is fetched and compared
+instead, which also covers chunks logged before hashes were recorded.
+
+    python reconcile.py --namespace default --dry-run
+"""
+
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+
+import pinecone_batch
+from embed_upsert import EMBEDDING_MODEL, client, index, load_chunk, log_chunks, ensure_chunk_log_table
+from workspaces import default_namespace, workspace
+
+# === CONFIG ===
+BATCH_SIZE = 100  # Chunks loaded, embedded and upserted together when repairing
+
+
+# === SNAPSHOTS ===
+def local_chunk_ids(ws):
+    return {path.stem for path in Path(ws.chunks_dir).glob("*.txt")}
+
+def logged_chunks(ws):
+    """Return {chunk_id: source_file} for chunks logged in the workspace's namespace"""
+    if not os.path.exists(ws.chunk_log):
+        return {}
+    conn = sqlite3.connect(ws.chunk_log)
+    cursor = conn.cursor()
+    ensure_chunk_log_table(cursor)
+    cursor.execute(
+        "SELECT chunk_id, source_file FROM chunks WHERE COALESCE(namespace, 'default') = ?", (ws.namespace,)
+    )
+    rows = dict(cursor.fetchall())
+    conn.close()
+    return rows
+
+def logged_text_hashes(ws):
+    """Return {chunk_id: text_hash} for logged chunks that have a hash recorded"""
+    if not os.path.exists(ws.chunk_log):
+        return {}
+    conn = sqlite3.connect(ws.chunk_log)
+    cursor = conn.cursor()
+    ensure_chunk_log_table(cursor)
+    cursor.execute(
+        "SELECT chunk_id, text_hash FROM chunks WHERE COALESCE(namespace, 'default') = ? AND text_hash IS NOT NULL",
+        (ws.namespace,)
+    )
+    rows = dict(cursor.fetchall())
+    conn.close()
+    return rows
+
+def local_text(chunk_id, ws):
+    return (Path(ws.chunks_dir) / f"{chunk_id}.txt").read_text()
+
+def remove_chunks_from_log(chunk_ids, db_path):
+    if not chunk_ids or not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+    conn.commit()
+    conn.close()
+
+
+def changed_since_logged(chunk_ids, hashes, ws):
+    """Chunks whose local text no longer matches the hash logged when they were upserted.
+
+    Local files only; chunks without a logged hash are not compared.
+    """
+    return [chunk_id for chunk_id in sorted(chunk_ids)
+            if chunk_id in hashes and pinecone_batch.text_hash(local_text(chunk_id, ws)) != hashes[chunk_id]]
+
+def changed_chunk_ids(chunk_ids, ws):
+    """Chunks whose vector text differs from the local chunk file, fetched one batch at a time"""
+    changed = []
+    for batch in pinecone_batch.batched(sorted(chunk_ids), pinecone_batch.FETCH_BATCH_SIZE):
+        # One fetch per batch; only this batch's vectors are held in memory
+        for chunk_id, vector in index.fetch(ids=batch, namespace=ws.namespace).vectors.items():
+            if (vector.metadata or {}).get("text") != local_text(chunk_id, ws):
+                changed.append(chunk_id)
+    return changed
+
+
+# === DIFF ===
+def diff(local_ids, logged, remote_ids, changed=()):
+    """Work out what needs repairing. All arguments are snapshots; nothing is fetched here."""
+    logged_ids = set(logged)
+    return {
+        # Local chunks with no vector (never upserted, or upsert failed after logging)
+        "missing": sorted(local_ids - remote_ids),
+        # Vectors whose text no longer matches the local chunk (re-chunked under the same id)
+        "changed": sorted(changed),
+        # Vectors whose chunk no longer exists locally (deleted outside the UI, re-chunked)
+        "orphaned": sorted(remote_ids - local_ids),
+        # Log entries that claim a vector which isn't there
+        "stale_log": sorted(logged_ids - remote_ids),
+        # Vectors that are present but were never logged
+        "unlogged": sorted((remote_ids & local_ids) - logged_ids),
+    }
+
+
+# === REPAIR ===
+def upsert_missing(chunk_ids, ws):
+    """Embed and upsert chunks in batches. Returns the ids that were upserted."""
+    upserted = []
+    for batch in pinecone_batch.batched(chunk_ids, BATCH_SIZE):
+        loaded = [(chunk_id, load_chunk(chunk_id, ws)) for chunk_id in batch]
+        skipped = [chunk_id for chunk_id, chunk in loaded if chunk is None]
+        if skipped:
+            print(f"⚠️ No metadata yet, skipping {len(skipped)} chunk(s); run generate_metadata.py first")
+        loaded = [(chunk_id, chunk) for chunk_id, chunk in loaded if chunk is not None]
+        if not loaded:
+            continue
+
+        embeddings = pinecone_batch.embed_texts(client, [text for _, (text, _) in loaded], EMBEDDING_MODEL)
+        vectors = [(chunk_id, embedding, metadata)
+                   for (chunk_id, (_, metadata)), embedding in zip(loaded, embeddings)]
+        pinecone_batch.upsert_vectors(index, vectors, ws.namespace)
+        log_chunks([(chunk_id, metadata.get("source_file", "unknown"), pinecone_batch.text_hash(metadata["text"]))
+                    for chunk_id, _, metadata in vectors], ws.namespace, ws.chunk_log)
+        upserted.extend(chunk_id for chunk_id, _, _ in vectors)
+        print(f"📤 Upserted {len(upserted)}/{len(chunk_ids)} missing chunk(s)")
+    return upserted
+
+def log_unlogged(chunk_ids, ws):
+    entries = []
+    for chunk_id in chunk_ids:
+        loaded = load_chunk(chunk_id, ws)
+        source_file = loaded[1].get("source_file", "unknown") if loaded else "unknown"
+        # The vector's text is unknown here, so no hash is logged
+        entries.append((chunk_id, source_file, None))
+    log_chunks(entries, ws.namespace, ws.chunk_log)
+
+def reconcile(namespace, dry_run=False, delete_orphans=True, check_content=False):
+    ws = workspace(namespace)
+    print(f"🔎 Reconciling namespace '{namespace}'")
+
+    local_ids = local_chunk_ids(ws)
+    logged = logged_chunks(ws)
+    remote_ids = pinecone_batch.list_ids(index, namespace)
+    print(f"📊 Local: {len(local_ids)}  Logged: {len(logged)}  In Pinecone: {len(remote_ids)}")
+
+    present = local_ids & remote_ids
+    if check_content:
+        print(f"🔍 Fetching {len(present)} vector(s) to compare their text with the local chunks")
+        changed = changed_chunk_ids(present, ws)
+    else:
+        hashes = logged_text_hashes(ws)
+        changed = changed_since_logged(present, hashes, ws)
+        unhashed = len(present - set(hashes))
+        if unhashed:
+            print(f"ℹ️ {unhashed} chunk(s) have no logged text hash; run with --check-content to compare them")
+
+    drift = diff(local_ids, logged, remote_ids, changed)
+    for kind, chunk_ids in drift.items():
+        preview = ", ".join(chunk_ids[:5]) + (" ..." if len(chunk_ids) > 5 else "")
+        print(f"   {kind}: {len(chunk_ids)}" + (f" ({preview})" if chunk_ids else ""))
+
+    if dry_run:
+        print("🧪 Dry run, nothing changed")
+        return drift
+
+    # Stale log entries go first; the missing ones that get upserted are re-logged below
+    remove_chunks_from_log(drift["stale_log"], ws.chunk_log)
+    if drift["stale_log"]:
+        print(f"🧹 Removed {len(drift['stale_log'])} stale chunk log entries")
+
+    if drift["orphaned"]:
+        if not local_ids:
+            # An empty or misplaced chunks directory would otherwise wipe the namespace
+            print(f"⚠️ No local chunks found; refusing to delete {len(drift['orphaned'])} vector(s)")
+        elif delete_orphans:
+            calls = pinecone_batch.delete_ids(index, drift["orphaned"], namespace)
+            print(f"🗑️ Deleted {len(drift['orphaned'])} orphaned vector(s) in {calls} call(s)")
+        else:
+            print(f"⏭️ Keeping {len(drift['orphaned'])} orphaned vector(s) (--keep-orphans)")
+
+    if drift["unlogged"]:
+        log_unlogged(drift["unlogged"], ws)
+        print(f"📝 Logged {len(drift['unlogged'])} chunk(s) already in Pinecone")
+
+    if drift["missing"] or drift["changed"]:
+        upserted = upsert_missing(drift["missing"] + drift["changed"], ws)
+        print(f"✅ Upserted {len(upserted)} missing or changed chunk(s)")
+
+    print("🏁 Reconcile complete")
+    return drift
+
+
+# === CLI ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile local chunks, chunklog.db and a Pinecone namespace.")
+    parser.add_argument("--namespace", type=str, default=default_namespace(), help="Pinecone namespace to reconcile")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without changing anything")
+    parser.add_argument("--keep-orphans", action="store_true", help="Do not delete vectors that have no local chunk")
+    parser.add_argument("--check-content", action="store_true",
+                        help="Fetch every vector and compare its text with the local chunk (slow on large namespaces)")
+    args = parser.parse_args()
+
+    reconcile(args.namespace, dry_run=args.dry_run, delete_orphans=not args.keep_orphans,
+              check_content=args.check_content)
@@ -0,0 +1,192 @@
+"""
+Background re-embed queue for chunk edits made in the web UI.
+
+Edits are written to disk by the request handler and queued here. Rapid
+successive saves of the same chunk collapse into a single job, and jobs that
+are ready at the same time are embedded and upserted together in one batch.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+# === CONFIG ===
+DEBOUNCE_SECONDS = 2.0   # Wait this long after the last save before embedding
+MAX_BATCH_SIZE = 64      # Max chunks per embeddings request / upsert call
+MAX_ATTEMPTS = 3         # Give up on a job after this many failed attempts
+RETRY_BACKOFF = 5.0      # Seconds to wait before retrying, multiplied per attempt
+
+
+class ReembedQueue:
+    """Coalescing queue that re-embeds edited chunks on a background thread.
+
+    `embed_texts` takes a list of strings and returns one embedding per string.
+    `upsert_vectors` takes a list of (id, embedding, metadata) tuples and a
+    namespace.
+    """
+
+    def __init__(self, embed_texts, upsert_vectors, debounce_seconds=DEBOUNCE_SECONDS, max_batch_size=MAX_BATCH_SIZE):
+        self.embed_texts = embed_texts
+        self.upsert_vectors = upsert_vectors
+        self.debounce_seconds = debounce_seconds
+        self.max_batch_size = max_batch_size
+
+        self._cond = threading.Condition()
+        self._pending = {}    # (namespace, chunk_id) -> job dict
+        self._in_flight = set()
+        self._discarded = set()  # in-flight keys deleted while embedding; never upserted
+        self._upsert_lock = threading.Lock()
+        self._status = {}     # (namespace, chunk_id) -> status dict
+        self._counters = {"enqueued": 0, "coalesced": 0, "embedded": 0, "failed": 0, "batches": 0}
+        self._worker = None
+
+    # === PUBLIC API ===
+    def enqueue(self, chunk_id, text, metadata, namespace="default"):
+        """Queue a chunk for re-embedding, replacing any pending job for it."""
+        key = (namespace, chunk_id)
+        now = time.monotonic()
+        with self._cond:
+            existing = self._pending.get(key)
+            if existing:
+                self._counters["coalesced"] += 1
+            self._pending[key] = {
+                "chunk_id": chunk_id,
+                "namespace": namespace,
+                "text": text,
+                "metadata": metadata,
+                "ready_at": now + self.debounce_seconds,
+                "attempts": existing["attempts"] if existing else 0,
+            }
+            self._counters["enqueued"] += 1
+            self._set_status(key, "pending")
+            self._ensure_worker()
+            self._cond.notify()
+
+    def status(self, chunk_id=None, namespace="default"):
+        """Return the status of one chunk, or a summary of the whole queue."""
+        with self._cond:
+            if chunk_id is not None:
+                return dict(self._status.get((namespace, chunk_id), {"state": "idle"}))
+            return {
+                "pending": len(self._pending),
+                "in_flight": len(self._in_flight),
+                "counters": dict(self._counters),
+                "failed": [
+                    {"chunk_id": key[1], "namespace": key[0], **status}
+                    for key, status in self._status.items()
+                    if status["state"] == "failed"
+                ],
+            }
+
+    def discard(self, chunk_id, namespace="default"):
+        """Drop any queued or in-flight job for a chunk, e.g. because it was deleted.
+
+        Waits for an upsert that is already running to finish, so a Pinecone
+        delete issued after this returns cannot be undone by the queue.
+        """
+        key = (namespace, chunk_id)
+        with self._upsert_lock:
+            with self._cond:
+                self._pending.pop(key, None)
+                self._status.pop(key, None)
+                if key in self._in_flight:
+                    self._discarded.add(key)
+
+    # === WORKER ===
+    def _ensure_worker(self):
+        # Started lazily so importing the module (e.g. in the Flask reloader
+        # parent process) does not spawn a thread that never gets any work.
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="reembed-queue", daemon=True)
+            self._worker.start()
+
+    def _set_status(self, key, state, error=None):
+        status = {"state": state, "updated_at": datetime.utcnow().isoformat()}
+        if error:
+            status["error"] = error
+        self._status[key] = status
+
+    def _take_ready_batch(self):
+        """Block until at least one job is ready, then pop up to a batch of them."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [key for key, job in self._pending.items()
+                         if job["ready_at"] <= now and key not in self._in_flight]
+                if ready:
+                    ready.sort(key=lambda k: self._pending[k]["ready_at"])
+                    batch = [self._pending.pop(key) for key in ready[:self.max_batch_size]]
+                    for job in batch:
+                        key = (job["namespace"], job["chunk_id"])
+                        self._in_flight.add(key)
+                        self._set_status(key, "in_progress")
+                    return batch
+                if self._pending:
+                    timeout = min(job["ready_at"] for job in self._pending.values()) - now
+                    self._cond.wait(timeout=max(timeout, 0.05))
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take_ready_batch()
+            try:
+                embeddings = self.embed_texts([job["text"] for job in batch])
+                with self._upsert_lock:
+                    # Chunks deleted while they were being embedded must not come back
+                    with self._cond:
+                        discarded = set(self._discarded)
+                    by_namespace = {}
+                    for job, embedding in zip(batch, embeddings):
+                        if (job["namespace"], job["chunk_id"]) in discarded:
+                            continue
+                        by_namespace.setdefault(job["namespace"], []).append(
+                            (job["chunk_id"], embedding, job["metadata"])
+                        )
+                    for namespace, vectors in by_namespace.items():
+                        self.upsert_vectors(vectors, namespace)
+            except Exception as e:
+                print(f"❌ Re-embed batch of {len(batch)} chunk(s) failed: {e}")
+                self._finish_failed(batch, str(e))
+                continue
+
+            print(f"✅ Re-embedded and upserted {len(batch)} chunk(s)")
+            self._finish_done(batch)
+
+    def _finish_done(self, batch):
+        with self._cond:
+            self._counters["batches"] += 1
+            self._counters["embedded"] += len(batch)
+            for job in batch:
+                key = (job["namespace"], job["chunk_id"])
+                self._in_flight.discard(key)
+                if key in self._discarded:
+                    self._discarded.discard(key)
+                    continue
+                # A newer save may have arrived while this one was embedding
+                if key not in self._pending:
+                    self._set_status(key, "done")
+            self._cond.notify()
+
+    def _finish_failed(self, batch, error):
+        now = time.monotonic()
+        with self._cond:
+            for job in batch:
+                key = (job["namespace"], job["chunk_id"])
+                self._in_flight.discard(key)
+                if key in self._discarded:
+                    # Deleted while in flight; nothing to retry
+                    self._discarded.discard(key)
+                    continue
+                if key in self._pending:
+                    # Superseded by a newer save; that job will be tried instead
+                    continue
+                job["attempts"] += 1
+                if job["attempts"] < MAX_ATTEMPTS:
+                    job["ready_at"] = now + RETRY_BACKOFF * job["attempts"]
+                    self._pending[key] = job
+                    self._set_status(key, "pending", error=error)
+                else:
+                    self._counters["failed"] += 1
+                    self._set_status(key, "failed", error=error)
+            self._cond.notify()
@@ -5,6 +5,7 @@ ChunkMunk Web UI Startup Script
 This script starts the web interface for previewing and editing chunks.
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -33,7 +34,27 @@ def check_dependencies():
     print(f"✅ Found {len(chunk_files)} chunk files")
     return True
 
+def serve_production(app, host, port, threads):
+    """Serve with waitress, a multi-threaded production WSGI server"""
+    try:
+        from waitress import serve
+    except ImportError:
+        print("❌ waitress is not installed!")
+        print("   Please run: pip install waitress")
+        sys.exit(1)
+    
+    # A single process with many threads: the re-embed queue and query caches
+    # live in memory, so they must be shared by every request handler.
+    serve(app, host=host, port=port, threads=threads, ident="ChunkMunk")
+
 def main():
+    parser = argparse.ArgumentParser(description="Start the ChunkMunk web UI.")
+    parser.add_argument("--prod", action="store_true", help="Serve with the multi-threaded production server instead of the Flask dev server")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--threads", type=int, default=16, help="Worker threads in production mode")
+    args = parser.parse_args()
+    
     print("🚀 Starting ChunkMunk Web UI...")
     print("=" * 50)
     
@@ -59,13 +80,20 @@ def main():
     print("   • Auto-save functionality")
     
     print("\n🌐 Starting server...")
-    print("   The web UI will be available at: http://localhost:8080")
+    if args.prod:
+        print(f"   Production mode: waitress with {args.threads} threads")
+    else:
+        print("   Development mode: Flask dev server with reloader (use --prod for production)")
+    print(f"   The web UI will be available at: http://localhost:{args.port}")
     print("   Press Ctrl+C to stop the server")
     print("=" * 50)
     
     # Import and run the web UI
     from web_ui import app
-    app.run(debug=True, host='0.0.0.0', port=8080)
+    if args.prod:
+        serve_production(app, args.host, args.port, args.threads)
+    else:
+        app.run(debug=True, host=args.host, port=args.port)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
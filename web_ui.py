@@ -1,14 +1,25 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, g
 import json
 import os
+import re
 from pathlib import Path
 from datetime import datetime
 import sqlite3
+import time
+import gzip
+import hashlib
+import threading
 from dotenv import load_dotenv
 import openai
 from openai import OpenAI
 from pinecone import Pinecone
 
+import pinecone_batch
+from query_cache import TTLCache
+from reembed_queue import ReembedQueue
+from version import __version__
+from workspaces import default_namespace, is_valid_namespace, list_namespaces, workspace
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -19,29 +30,256 @@ print(f"📦 PINECONE_INDEX: {os.environ.get('PINECONE_INDEX', 'Not Found')}")
 app = Flask(__name__)
 
 # Configuration
-CHUNKS_DIR = "chunks"
-METADATA_DIR = "metadata"
 PINECONE_INDEX = os.getenv("PINECONE_INDEX")
 EMBEDDING_MODEL = "text-embedding-3-large"
-PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "default")
+CHUNK_ID_PATTERN = re.compile(r"^[^./\\\x00][^/\\\x00]{0,511}$")  # Ids become file names; no separators
+NAMESPACE_COOKIE = "namespace"
+NAMESPACE_COOKIE_MAX_AGE = 365 * 24 * 3600
+QUERY_TOP_K = 5
+QUERY_MAX_TOP_K = 50
+STATIC_MAX_AGE = 365 * 24 * 3600  # Static URLs carry ?v=<content hash>, so they can be cached for long
+GZIP_MIN_SIZE = 500
+GZIP_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript'}
+
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
 
 # === INIT PINECONE ===
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index = pc.Index(host="upstate-gcjwpkh.svc.aped-4627-b74a.pinecone.io")
 
+# === INIT OPENAI ===
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def embed_texts(texts):
+    """Embed a list of texts with as few OpenAI requests as possible"""
+    return pinecone_batch.embed_texts(client, texts, EMBEDDING_MODEL)
+
+def upsert_vectors(vectors, namespace):
+    """Upsert re-embedded chunks and log them; called from the re-embed queue's worker thread"""
+    pinecone_batch.upsert_vectors(index, vectors, namespace)
+    invalidate_query_results()
+    log_chunks([(chunk_id, metadata.get('source_file', 'unknown'), pinecone_batch.text_hash(metadata['text']))
+                for chunk_id, _, metadata in vectors], namespace=namespace)
+
+# === QUERY CACHES ===
+# Query embeddings only depend on the query text and model, so they can live
+# long; results go stale whenever chunks change and are cleared on every write.
+embedding_cache = TTLCache(maxsize=2048, ttl=24 * 3600)
+result_cache = TTLCache(maxsize=1024, ttl=300)
+
+# Bumped on every write made through this app; part of the list page ETags
+# so that changes to Pinecone state are reflected even if no file changed.
+_state_generation = 0
+_state_lock = threading.Lock()
+
+def invalidate_query_results():
+    global _state_generation
+    with _state_lock:
+        _state_generation += 1
+        result_cache.clear()
+
+def state_generation():
+    with _state_lock:
+        return _state_generation
+
+def cache_query_result(key, matches, generation):
+    """Cache query results unless a write happened while the query was running"""
+    with _state_lock:
+        if generation == _state_generation:
+            result_cache.set(key, matches)
+
+# === RE-EMBED QUEUE ===
+reembed_queue = ReembedQueue(embed_texts, upsert_vectors)
+
+def write_file_atomic(path, text):
+    """Write via a temp file and rename, so concurrent readers never see a partial chunk"""
+    tmp_path = Path(path).with_name(f".{Path(path).name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# === NAMESPACE SELECTION ===
+def is_known_namespace(namespace):
+    return is_valid_namespace(namespace) and namespace in list_namespaces()
+
+def current_namespace():
+    """Namespace for this request: `?ns=`, then the namespace cookie, then the default.
+
+    An unknown `?ns=` never falls back; `reject_unknown_namespace` answers 404 first.
+    """
+    if 'ns' in request.args:
+        return request.args['ns']
+    namespace = request.cookies.get(NAMESPACE_COOKIE)
+    return namespace if is_known_namespace(namespace) else default_namespace()
+
+def current_workspace():
+    """Chunks, metadata and chunk log of the namespace selected for this request"""
+    if 'workspace' not in g:
+        g.workspace = workspace(current_namespace())
+    return g.workspace
+
+def explicit_namespace_error():
+    """Error response unless the request names its namespace with `?ns=`.
+
+    Write and destructive endpoints must act on the namespace the page was
+    rendered for, not on the cookie, which another tab may have switched.
+    """
+    namespace = request.args.get('ns')
+    if not namespace:
+        return jsonify({'success': False, 'message': 'Missing ns parameter; reload the page and try again'}), 400
+    if not is_known_namespace(namespace):
+        return jsonify({'success': False, 'message': f'Unknown namespace: {namespace}'}), 404
+    return None
+
+@app.before_request
+def reject_unknown_namespace():
+    """Serving another tenant's data for a mistyped `?ns=` would break namespace isolation"""
+    if 'ns' not in request.args or request.path.startswith(app.static_url_path + '/'):
+        return None
+    error = explicit_namespace_error()
+    if error and not request.path.startswith('/api/'):
+        return f"Unknown namespace: {request.args['ns']}", error[1]
+    return error
+
+def is_valid_chunk_id(chunk_id):
+    return isinstance(chunk_id, str) and CHUNK_ID_PATTERN.match(chunk_id) is not None and '..' not in chunk_id
+
+def chunk_paths(chunk_id, ws=None):
+    """(chunk file, metadata file) of a chunk; ValueError if the id could escape the workspace"""
+    ws = ws or current_workspace()
+    if not is_valid_chunk_id(chunk_id):
+        raise ValueError(f"Invalid chunk id: {chunk_id!r}")
+    paths = []
+    for directory, suffix in ((ws.chunks_dir, ".txt"), (ws.metadata_dir, ".json")):
+        root = Path(directory).resolve()
+        path = (root / f"{chunk_id}{suffix}").resolve()
+        if path.parent != root:
+            raise ValueError(f"Invalid chunk id: {chunk_id!r}")
+        paths.append(path)
+    return tuple(paths)
+
+# === HTTP CACHING + COMPRESSION ===
+def file_signature(*paths):
+    """(name, mtime_ns, size) of each existing path; cheap to compute, changes on every write"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return signature
+
+def asset_signature():
+    """Signature of every template and static file; the rendered HTML depends on both"""
+    paths = []
+    for folder in (os.path.join(app.root_path, app.template_folder), app.static_folder):
+        for directory, _, names in os.walk(folder):
+            paths.extend(os.path.join(directory, name) for name in names)
+    return file_signature(*sorted(paths))
+
+def conditional_render(signature, render):
+    """Return 304 if the client's copy matches `signature`, otherwise render with an ETag.
+
+    The ETag also covers templates and static files, so editing either changes
+    the page (and the hashed static URLs in it). It is weak because responses
+    may be gzip-encoded on the way out. There is no Last-Modified: deleted
+    files, Pinecone writes and namespace switches don't move any mtime forward,
+    so If-Modified-Since would answer 304 for a changed page.
+    """
+    etag = hashlib.sha1(repr((signature, asset_signature(), __version__)).encode()).hexdigest()
+    not_modified = bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+    response = make_response('', 304) if not_modified else make_response(render())
+    response.set_etag(etag, weak=True)
+    # Browsers may keep the page but must revalidate, which is a cheap 304 when unchanged
+    response.cache_control.no_cache = True
+    return response
+
+def listing_signature():
+    """Validator for pages that list every chunk"""
+    ws = current_workspace()
+    paths = sorted(Path(ws.chunks_dir).glob("*.txt")) + sorted(Path(ws.metadata_dir).glob("*.json"))
+    generation = state_generation()
+    return file_signature(ws.chunk_log, "ingestjobs.db", *paths) + [
+        ('namespace', ws.namespace), ('generation', generation), ('args', sorted(request.args.items()))
+    ]
+
+_static_hashes = {}  # (path, mtime_ns, size) -> content hash
+
+def static_url(filename):
+    """URL of a static file with a hash of its contents, so an edited file gets a new URL"""
+    path = os.path.join(app.static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return url_for('static', filename=filename)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _static_hashes:
+        with open(path, 'rb') as f:
+            _static_hashes[key] = hashlib.sha1(f.read()).hexdigest()[:12]
+    return url_for('static', filename=filename, v=_static_hashes[key])
+
+@app.context_processor
+def inject_static_url():
+    return {'static_url': static_url}
+
+@app.context_processor
+def inject_namespaces():
+    # For the namespace switcher in the navbar
+    return {'namespace': current_namespace(), 'namespaces': list_namespaces()}
+
+@app.after_request
+def add_caching_and_compression(response):
+    if request.path.startswith(app.static_url_path + '/'):
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        if response.status_code == 200 and response.mimetype in GZIP_MIMETYPES:
+            # Flask streams static files from disk; buffer these small text files so they get compressed too
+            response.direct_passthrough = False
+    else:
+        # Pages and API responses depend on the selected namespace
+        response.vary.add('Cookie')
+        # Only page navigation switches the namespace; API calls just name one
+        selected = request.args.get('ns') if not request.path.startswith('/api/') else None
+        if is_known_namespace(selected) and request.cookies.get(NAMESPACE_COOKIE) != selected:
+            response.set_cookie(NAMESPACE_COOKIE, selected, max_age=NAMESPACE_COOKIE_MAX_AGE, samesite='Lax')
+    
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in GZIP_MIMETYPES
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    # The compressed bytes are a different representation: weaken the ETag, no byte ranges
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    response.headers.pop('Accept-Ranges', None)
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def index_route():
     """Main page showing all chunks, with optional source_file filter"""
+    return conditional_render(listing_signature(), render_index)
+
+def render_index():
     filter_source = request.args.get('source')
     chunks = []
     all_sources = set()
     
+    ws = current_workspace()
+    
     # Get all chunk files
-    chunk_files = sorted(Path(CHUNKS_DIR).glob("*.txt"))
+    chunk_files = sorted(Path(ws.chunks_dir).glob("*.txt"))
     
     for chunk_file in chunk_files:
         chunk_id = chunk_file.stem
-        metadata_file = Path(METADATA_DIR) / f"{chunk_id}.json"
+        metadata_file = Path(ws.metadata_dir) / f"{chunk_id}.json"
         
         # Read chunk content
         with open(chunk_file, 'r', encoding='utf-8') as f:
@@ -59,9 +297,6 @@ def index_route():
         if filter_source and filter_source != 'all' and source_file != filter_source:
             continue
         
-        # Check if chunk is in Pinecone
-        in_pinecone = is_chunk_in_pinecone(chunk_id)
-        
         chunks.append({
             'id': chunk_id,
             'content': content,
@@ -70,94 +305,116 @@ def index_route():
             'source_file': source_file,
             'summary': metadata.get('summary', 'No summary available'),
             'tags': metadata.get('tags', []),
-            'in_pinecone': in_pinecone
+            'in_pinecone': False
         })
     
+    # Check which chunks are in Pinecone with batched fetches
+    in_pinecone = chunks_in_pinecone([chunk['id'] for chunk in chunks])
+    for chunk in chunks:
+        chunk['in_pinecone'] = chunk['id'] in in_pinecone
+    
     all_sources = sorted(all_sources)
     return render_template('index.html', chunks=chunks, all_sources=all_sources, filter_source=filter_source or 'all')
 
 @app.route('/chunk/<chunk_id>')
 def view_chunk(chunk_id):
     """View/edit a specific chunk"""
-    chunk_file = Path(CHUNKS_DIR) / f"{chunk_id}.txt"
-    metadata_file = Path(METADATA_DIR) / f"{chunk_id}.json"
+    try:
+        chunk_file, metadata_file = chunk_paths(chunk_id)
+    except ValueError:
+        return "Chunk not found", 404
     
     if not chunk_file.exists():
         return "Chunk not found", 404
     
-    # Read chunk content
-    with open(chunk_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Read metadata if exists
-    metadata = {}
-    if metadata_file.exists():
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+    def render():
+        # Read chunk content
+        with open(chunk_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        # Read metadata if exists
+        metadata = {}
+        if metadata_file.exists():
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        
+        return render_template('chunk_detail.html', 
+                             chunk_id=chunk_id,
+                             content=content,
+                             metadata=metadata)
     
-    return render_template('chunk_detail.html', 
-                         chunk_id=chunk_id,
-                         content=content,
-                         metadata=metadata)
+    return conditional_render(file_signature(chunk_file, metadata_file), render)
 
 @app.route('/api/chunk/<chunk_id>', methods=['PUT'])
 def update_chunk(chunk_id):
-    """Update chunk content and metadata, and upsert to Pinecone"""
+    """Update chunk content and metadata, and queue a background re-embed"""
+    error = explicit_namespace_error()
+    if error:
+        return error
     data = request.json
+    ws = current_workspace()
+    try:
+        chunk_file, metadata_file = chunk_paths(chunk_id, ws)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not chunk_file.exists():
+        return jsonify({'success': False, 'message': f'Chunk {chunk_id} not found in namespace {ws.namespace}'}), 404
     
     # Update chunk content
-    chunk_file = Path(CHUNKS_DIR) / f"{chunk_id}.txt"
-    if chunk_file.exists():
-        with open(chunk_file, 'w', encoding='utf-8') as f:
-            f.write(data['content'])
+    write_file_atomic(chunk_file, data['content'])
     
     # Update metadata
-    metadata_file = Path(METADATA_DIR) / f"{chunk_id}.json"
     metadata = data.get('metadata', {})
     metadata['updated_at'] = datetime.utcnow().isoformat()
     
-    with open(metadata_file, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2)
+    write_file_atomic(metadata_file, json.dumps(metadata, indent=2))
     
-    # === Upsert to Pinecone ===
-    try:
-        # Get OpenAI API key and embedding model
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        embedding_model = EMBEDDING_MODEL
-        
-        # Generate new embedding for the updated content
-        client = OpenAI(api_key=openai_api_key)
-        embedding_response = client.embeddings.create(
-            input=data['content'],
-            model=embedding_model
-        )
-        embedding = embedding_response.data[0].embedding
-        
-        # Upsert to Pinecone
-        index.upsert([
-            (chunk_id, embedding, metadata)
-        ], namespace=PINECONE_NAMESPACE)
-        print(f"✅ Upserted updated chunk to Pinecone: {chunk_id}")
-    except Exception as e:
-        print(f"❌ Error upserting updated chunk to Pinecone: {e}")
-        return jsonify({'success': False, 'message': f'Error upserting to Pinecone: {str(e)}'}), 500
+    # === Queue re-embed; repeated saves of this chunk are coalesced ===
+    vector_metadata = dict(metadata, text=data['content'], embedding_model=EMBEDDING_MODEL)
+    reembed_queue.enqueue(chunk_id, data['content'], vector_metadata, namespace=ws.namespace)
+    invalidate_query_results()
+    print(f"🕒 Queued re-embed for updated chunk: {chunk_id}")
     
-    return jsonify({'success': True, 'message': 'Chunk updated successfully and upserted to Pinecone'})
+    return jsonify({
+        'success': True,
+        'message': 'Chunk saved; re-embedding queued',
+        'reembed': reembed_queue.status(chunk_id, namespace=ws.namespace)
+    }), 202
+
+@app.route('/api/reembed/status')
+def reembed_status():
+    """Summary of the background re-embed queue"""
+    return jsonify(reembed_queue.status())
+
+@app.route('/api/reembed/status/<chunk_id>')
+def reembed_chunk_status(chunk_id):
+    """Re-embed state of a single chunk: idle, pending, in_progress, done or failed"""
+    return jsonify(reembed_queue.status(chunk_id, namespace=current_namespace()))
 
 @app.route('/api/chunk/<chunk_id>', methods=['DELETE'])
 def delete_chunk(chunk_id):
     """Delete a chunk and its metadata from both local files and Pinecone"""
-    chunk_file = Path(CHUNKS_DIR) / f"{chunk_id}.txt"
-    metadata_file = Path(METADATA_DIR) / f"{chunk_id}.json"
+    error = explicit_namespace_error()
+    if error:
+        return error
+    ws = current_workspace()
+    try:
+        chunk_file, metadata_file = chunk_paths(chunk_id, ws)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    # Use environment variable for namespace
-    namespace = PINECONE_NAMESPACE
+    # Namespace selected in the UI (or the configured default)
+    namespace = ws.namespace
     
     try:
+        # Drop any queued re-embed so it cannot resurrect the vector
+        reembed_queue.discard(chunk_id, namespace=namespace)
+        
         # Delete from Pinecone if it exists there
         if namespace:
             print(f"🗑️ Deleting from Pinecone namespace: {namespace}")
             index.delete(ids=[chunk_id], namespace=namespace)
+            invalidate_query_results()
             print(f"✅ Deleted from Pinecone: {chunk_id}")
         
         # Remove from chunk log
@@ -178,48 +435,257 @@ def delete_chunk(chunk_id):
         print(f"❌ Error deleting chunk {chunk_id}: {e}")
         return jsonify({'success': False, 'message': f'Error deleting chunk: {str(e)}'}), 500
 
-def get_chunk_namespace(chunk_id):
-    """Get the namespace where a chunk was stored in Pinecone"""
-    if not os.path.exists("chunklog.db"):
+# === BULK OPERATIONS ===
+def load_metadata(chunk_id):
+    metadata_file = chunk_paths(chunk_id)[1]
+    if not metadata_file.exists():
+        return {}
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+def metadata_updates_error(updates):
+    """Why `updates` can't be stored as Pinecone metadata, or None if it can"""
+    if not isinstance(updates, dict):
+        return 'set must be an object'
+    for name, value in updates.items():
+        if name in ('tags', 'source_file'):
+            valid = is_string_list(value) if name == 'tags' else isinstance(value, str)
+            expected = 'a list of strings' if name == 'tags' else 'a string'
+        else:
+            # Pinecone metadata values are strings, numbers, booleans or lists of strings
+            valid = isinstance(value, (str, int, float, bool)) or is_string_list(value)
+            expected = 'a string, number, boolean or list of strings'
+        if not valid:
+            return f'set.{name} must be {expected}'
+    return None
+
+def select_chunk_ids(data, local_only=True):
+    """Resolve a bulk request body to chunk ids.
+
+    Accepts one of `ids` (list), `source_file` or `tag`. With `local_only`,
+    explicit ids without a local chunk file are dropped. Returns None if no
+    selector was given; raises ValueError for a malformed selector or for ids
+    that are not safe file names.
+    """
+    chunks_dir = Path(current_workspace().chunks_dir)
+    if data.get('ids') is not None:
+        if not is_string_list(data['ids']):
+            raise ValueError("ids must be a list of strings")
+        invalid = [chunk_id for chunk_id in data['ids'] if not is_valid_chunk_id(chunk_id)]
+        if invalid:
+            raise ValueError(f"Invalid chunk id(s): {invalid}")
+        if not local_only:
+            return list(data['ids'])
+        return [chunk_id for chunk_id in data['ids'] if chunk_paths(chunk_id)[0].exists()]
+    
+    source_file = data.get('source_file')
+    tag = data.get('tag')
+    for name, value in (('source_file', source_file), ('tag', tag)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+    if not source_file and not tag:
         return None
     
-    conn = sqlite3.connect("chunklog.db")
-    cursor = conn.cursor()
+    selected = []
+    for chunk_file in sorted(chunks_dir.glob("*.txt")):
+        metadata = load_metadata(chunk_file.stem)
+        if source_file and metadata.get('source_file') != source_file:
+            continue
+        if tag and tag.lower() not in [t.lower() for t in metadata.get('tags', [])]:
+            continue
+        selected.append(chunk_file.stem)
+    return selected
+
+def bulk_request_ids(local_only=True):
+    """Parse the JSON body of a bulk request, returning (data, ids, error_response)"""
+    error = explicit_namespace_error()
+    if error:
+        return None, None, error
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return data, None, (jsonify({'success': False, 'message': 'Request body must be a JSON object'}), 400)
+    try:
+        chunk_ids = select_chunk_ids(data, local_only=local_only)
+    except ValueError as e:
+        return data, None, (jsonify({'success': False, 'message': str(e)}), 400)
+    if chunk_ids is None:
+        return data, None, (jsonify({'success': False, 'message': 'Provide one of: ids, source_file, tag'}), 400)
+    return data, chunk_ids, None
+
+@app.route('/api/chunks/bulk/delete', methods=['POST'])
+def bulk_delete_chunks():
+    """Delete many chunks from Pinecone, the chunk log and local files"""
+    data, chunk_ids, error = bulk_request_ids(local_only=False)
+    if error:
+        return error
+    ws = current_workspace()
+    namespace = ws.namespace
     
-    # Check if namespace column exists, if not return 'default'
-    cursor.execute("PRAGMA table_info(chunks)")
-    columns = [column[1] for column in cursor.fetchall()]
+    try:
+        for chunk_id in chunk_ids:
+            reembed_queue.discard(chunk_id, namespace=namespace)
+        
+        calls = pinecone_batch.delete_ids(index, chunk_ids, namespace)
+        invalidate_query_results()
+        print(f"🗑️ Deleted {len(chunk_ids)} chunk(s) from Pinecone namespace {namespace} in {calls} call(s)")
+        
+        remove_chunks_from_log(chunk_ids)
+        
+        for chunk_id in chunk_ids:
+            for path in chunk_paths(chunk_id, ws):
+                if path.exists():
+                    path.unlink()
+        print(f"✅ Deleted {len(chunk_ids)} local chunk(s)")
+        
+        return jsonify({'success': True, 'count': len(chunk_ids), 'pinecone_calls': calls,
+                        'message': f'Deleted {len(chunk_ids)} chunk(s)'})
+    except Exception as e:
+        print(f"❌ Error bulk deleting chunks: {e}")
+        return jsonify({'success': False, 'message': f'Error deleting chunks: {str(e)}'}), 500
+
+@app.route('/api/chunks/bulk/reembed', methods=['POST'])
+def bulk_reembed_chunks():
+    """Re-embed many chunks and upsert them in batches"""
+    data, chunk_ids, error = bulk_request_ids()
+    if error:
+        return error
+    ws = current_workspace()
+    namespace = ws.namespace
     
-    if 'namespace' in columns:
-        cursor.execute("SELECT namespace FROM chunks WHERE chunk_id = ?", (chunk_id,))
-        result = cursor.fetchone()
-        namespace = result[0] if result else 'default'
-    else:
-        # If no namespace column, assume 'default'
-        namespace = 'default'
+    try:
+        texts = []
+        vectors_metadata = []
+        embedded_at = datetime.utcnow().isoformat()
+        for chunk_id in chunk_ids:
+            with open(chunk_paths(chunk_id, ws)[0], 'r', encoding='utf-8') as f:
+                content = f.read()
+            metadata = load_metadata(chunk_id)
+            metadata.update({
+                "text": content,
+                "embedding_model": EMBEDDING_MODEL,
+                "embedded_at": embedded_at
+            })
+            texts.append(content)
+            vectors_metadata.append(metadata)
+        
+        embeddings = embed_texts(texts)
+        vectors = list(zip(chunk_ids, embeddings, vectors_metadata))
+        calls = pinecone_batch.upsert_vectors(index, vectors, namespace)
+        invalidate_query_results()
+        print(f"✅ Re-embedded {len(chunk_ids)} chunk(s) into namespace {namespace} in {calls} upsert call(s)")
+        
+        log_chunks([(chunk_id, md.get('source_file', 'unknown'), pinecone_batch.text_hash(text))
+                    for chunk_id, md, text in zip(chunk_ids, vectors_metadata, texts)], namespace=namespace)
+        
+        return jsonify({'success': True, 'count': len(chunk_ids), 'pinecone_calls': calls,
+                        'message': f'Re-embedded {len(chunk_ids)} chunk(s)'})
+    except Exception as e:
+        print(f"❌ Error bulk re-embedding chunks: {e}")
+        return jsonify({'success': False, 'message': f'Error re-embedding chunks: {str(e)}'}), 500
+
+@app.route('/api/chunks/bulk/metadata', methods=['POST'])
+def bulk_update_metadata():
+    """Update metadata of many chunks without re-embedding them.
+
+    Body: a selector plus any of `set` (dict of fields to overwrite),
+    `add_tags` and `remove_tags` (lists). Existing vectors are fetched and
+    re-upserted with the new metadata in batches.
+    """
+    data, chunk_ids, error = bulk_request_ids()
+    if error:
+        return error
+    ws = current_workspace()
+    namespace = ws.namespace
+    updates = data.get('set', {})
+    message = metadata_updates_error(updates)
+    if message:
+        return jsonify({'success': False, 'message': message}), 400
+    for name in ('add_tags', 'remove_tags'):
+        if not is_string_list(data.get(name, [])):
+            return jsonify({'success': False, 'message': f'{name} must be a list of strings'}), 400
+    add_tags = [t.strip().lower() for t in data.get('add_tags', []) if t.strip()]
+    remove_tags = {t.strip().lower() for t in data.get('remove_tags', [])}
     
-    conn.close()
-    return namespace
+    try:
+        updated_at = datetime.utcnow().isoformat()
+        new_metadata = {}
+        for chunk_id in chunk_ids:
+            metadata = load_metadata(chunk_id)
+            metadata.update(updates)
+            tags = [t for t in metadata.get('tags', []) if t.lower() not in remove_tags]
+            tags += [t for t in add_tags if t not in tags]
+            metadata['tags'] = tags
+            metadata['updated_at'] = updated_at
+            new_metadata[chunk_id] = metadata
+        
+        # Carry over the stored embeddings so nothing needs re-embedding
+        existing = pinecone_batch.fetch_vectors(index, chunk_ids, namespace)
+        vectors = []
+        for chunk_id, vector in existing.items():
+            metadata = dict(vector.metadata or {})
+            metadata.update(new_metadata[chunk_id])
+            vectors.append((chunk_id, vector.values, metadata))
+        calls = pinecone_batch.upsert_vectors(index, vectors, namespace)
+        invalidate_query_results()
+        
+        # Local files only change once Pinecone has accepted the new metadata
+        for chunk_id, metadata in new_metadata.items():
+            write_file_atomic(chunk_paths(chunk_id, ws)[1], json.dumps(metadata, indent=2))
+        missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in existing]
+        print(f"✅ Updated metadata of {len(chunk_ids)} chunk(s); {len(vectors)} vector(s) upserted in {calls} call(s)")
+        
+        if 'source_file' in updates:
+            update_logged_source_files([(updates['source_file'], chunk_id) for chunk_id in existing])
+        
+        return jsonify({'success': True, 'count': len(chunk_ids), 'pinecone_calls': calls,
+                        'not_in_pinecone': missing,
+                        'message': f'Updated metadata of {len(chunk_ids)} chunk(s)'})
+    except Exception as e:
+        print(f"❌ Error bulk updating metadata: {e}")
+        return jsonify({'success': False, 'message': f'Error updating metadata: {str(e)}'}), 500
 
 def remove_chunk_from_log(chunk_id):
     """Remove a chunk from the SQLite log"""
-    if not os.path.exists("chunklog.db"):
+    chunk_log = current_workspace().chunk_log
+    if not os.path.exists(chunk_log):
         return
     
-    conn = sqlite3.connect("chunklog.db")
+    conn = sqlite3.connect(chunk_log)
     cursor = conn.cursor()
     cursor.execute("DELETE FROM chunks WHERE chunk_id = ?", (chunk_id,))
     conn.commit()
     conn.close()
     print(f"✅ Removed from chunk log: {chunk_id}")
 
+def remove_chunks_from_log(chunk_ids):
+    """Remove many chunks from the SQLite log in one transaction"""
+    chunk_log = current_workspace().chunk_log
+    if not os.path.exists(chunk_log):
+        return
+    
+    conn = sqlite3.connect(chunk_log)
+    cursor = conn.cursor()
+    cursor.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+    conn.commit()
+    conn.close()
+    print(f"✅ Removed {len(chunk_ids)} chunk(s) from chunk log")
+
 @app.route('/search')
 def search():
     """Search chunks by content or metadata"""
+    return conditional_render(listing_signature(), render_search)
+
+def render_search():
     query = request.args.get('q', '').lower()
     chunks = []
+    ws = current_workspace()
     
-    chunk_files = sorted(Path(CHUNKS_DIR).glob("*.txt"))
+    chunk_files = sorted(Path(ws.chunks_dir).glob("*.txt"))
     
     for chunk_file in chunk_files:
         chunk_id = chunk_file.stem
@@ -229,7 +695,7 @@ def search():
             content = f.read()
         
         # Read metadata
-        metadata_file = Path(METADATA_DIR) / f"{chunk_id}.json"
+        metadata_file = Path(ws.metadata_dir) / f"{chunk_id}.json"
         metadata = {}
         if metadata_file.exists():
             with open(metadata_file, 'r', encoding='utf-8') as f:
@@ -239,9 +705,6 @@ def search():
         searchable_text = f"{content} {metadata.get('summary', '')} {' '.join(metadata.get('tags', []))}".lower()
         
         if query in searchable_text:
-            # Check if chunk is in Pinecone
-            in_pinecone = is_chunk_in_pinecone(chunk_id)
-            
             chunks.append({
                 'id': chunk_id,
                 'content': content[:200] + "..." if len(content) > 200 else content,
@@ -250,71 +713,210 @@ def search():
                 'source_file': metadata.get('source_file', 'Unknown'),
                 'summary': metadata.get('summary', 'No summary available'),
                 'tags': metadata.get('tags', []),
-                'in_pinecone': in_pinecone
+                'in_pinecone': False
             })
     
+    # Check which chunks are in Pinecone with batched fetches
+    in_pinecone = chunks_in_pinecone([chunk['id'] for chunk in chunks])
+    for chunk in chunks:
+        chunk['in_pinecone'] = chunk['id'] in in_pinecone
+    
     return render_template('search.html', chunks=chunks, query=query)
 
-def log_chunk(chunk_id, source_file, namespace="default"):
-    conn = sqlite3.connect("chunklog.db")
-    cursor = conn.cursor()
-    
+def ensure_chunk_log_table(cursor):
     # Create table with namespace column if it doesn't exist
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS chunks (
             chunk_id TEXT PRIMARY KEY,
             source_file TEXT,
             embedded_at TEXT,
-            namespace TEXT DEFAULT 'default'
+            namespace TEXT DEFAULT 'default',
+            text_hash TEXT
         )
     """)
     
-    # Add namespace column if it doesn't exist (for backward compatibility)
+    # Add columns that older logs lack (for backward compatibility)
     cursor.execute("PRAGMA table_info(chunks)")
     columns = [column[1] for column in cursor.fetchall()]
     if 'namespace' not in columns:
         cursor.execute("ALTER TABLE chunks ADD COLUMN namespace TEXT DEFAULT 'default'")
-    
-    cursor.execute("""
-        INSERT OR IGNORE INTO chunks (chunk_id, source_file, embedded_at, namespace)
-        VALUES (?, ?, ?, ?)
-    """, (chunk_id, source_file, datetime.utcnow().isoformat(), namespace))
+    if 'text_hash' not in columns:
+        cursor.execute("ALTER TABLE chunks ADD COLUMN text_hash TEXT")
+
+def log_chunks(entries, namespace="default"):
+    """Log many (chunk_id, source_file, text_hash) entries in one transaction, refreshing embedded_at.
+
+    Uses the namespace's own chunk log, so it also works outside a request.
+    """
+    embedded_at = datetime.utcnow().isoformat()
+    conn = sqlite3.connect(workspace(namespace).chunk_log)
+    cursor = conn.cursor()
+    ensure_chunk_log_table(cursor)
+    cursor.executemany("""
+        INSERT OR REPLACE INTO chunks (chunk_id, source_file, embedded_at, namespace, text_hash)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(chunk_id, source_file, embedded_at, namespace, text_hash) for chunk_id, source_file, text_hash in entries])
     conn.commit()
     conn.close()
 
-def is_chunk_in_pinecone(chunk_id):
-    namespace = PINECONE_NAMESPACE
+def update_logged_source_files(pairs):
+    """Set source_file for many logged chunks; `pairs` is a list of (source_file, chunk_id)"""
+    chunk_log = current_workspace().chunk_log
+    if not os.path.exists(chunk_log):
+        return
+    conn = sqlite3.connect(chunk_log)
+    cursor = conn.cursor()
+    cursor.executemany("UPDATE chunks SET source_file = ? WHERE chunk_id = ?", pairs)
+    conn.commit()
+    conn.close()
+
+def chunks_in_pinecone(chunk_ids):
+    """Set of the given chunk ids that exist in Pinecone, looked up in batches"""
     try:
-        response = index.fetch(ids=[chunk_id], namespace=namespace)
-        return chunk_id in response.vectors
+        return set(pinecone_batch.fetch_vectors(index, chunk_ids, current_namespace()))
     except Exception as e:
-        print(f"Error checking Pinecone for {chunk_id}: {e}")
-        return False
+        print(f"Error checking Pinecone for {len(chunk_ids)} chunk(s): {e}")
+        return set()
+
+# === RETRIEVAL ===
+def embed_query(query):
+    """Embed a query, reusing the cached embedding for repeated queries"""
+    key = (EMBEDDING_MODEL, query)
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        embedding = embed_texts([query])[0]
+        embedding_cache.set(key, embedding)
+    return embedding
+
+def build_query_filter(source_file=None, tags=None):
+    """Pinecone metadata filter for the optional source_file / tags parameters"""
+    conditions = {}
+    if source_file:
+        conditions['source_file'] = {'$eq': source_file}
+    if tags:
+        conditions['tags'] = {'$in': tags}
+    return conditions or None
+
+@app.route('/api/query', methods=['GET', 'POST'])
+def query_chunks():
+    """Semantic search over the selected namespace.
+
+    Parameters (JSON body or query string): `q`/`query`, `top_k`,
+    `source_file` and `tags` (list of strings, or a comma-separated string).
+    """
+    started = time.perf_counter()
+    if request.method == 'POST':
+        params = request.get_json(silent=True) or {}
+        if not isinstance(params, dict):
+            return jsonify({'success': False, 'message': 'Request body must be a JSON object'}), 400
+    else:
+        params = request.args
+    
+    tags = params.get('tags') or []
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    if not is_string_list(tags):
+        return jsonify({'success': False, 'message': 'tags must be a list of strings or a comma-separated string'}), 400
+    
+    query = params.get('query') or params.get('q') or ''
+    if not isinstance(query, str):
+        return jsonify({'success': False, 'message': 'query must be a string'}), 400
+    query = query.strip()
+    if not query:
+        return jsonify({'success': False, 'message': 'Missing query'}), 400
+    try:
+        top_k = min(max(int(params.get('top_k', QUERY_TOP_K)), 1), QUERY_MAX_TOP_K)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'top_k must be an integer'}), 400
+    source_file = params.get('source_file') or None
+    if source_file is not None and not isinstance(source_file, str):
+        return jsonify({'success': False, 'message': 'source_file must be a string'}), 400
+    tags = sorted({t.strip().lower() for t in tags if t.strip()})
+    namespace = current_namespace()
+    
+    key = (namespace, EMBEDDING_MODEL, query, top_k, source_file, tuple(tags))
+    matches = result_cache.get(key)
+    cached = matches is not None
+    if not cached:
+        # Read before querying; results of a query that overlapped a write are not cached
+        generation = state_generation()
+        try:
+            response = index.query(
+                vector=embed_query(query),
+                top_k=top_k,
+                namespace=namespace,
+                filter=build_query_filter(source_file, tags),
+                include_metadata=True
+            )
+        except Exception as e:
+            print(f"❌ Error querying Pinecone: {e}")
+            return jsonify({'success': False, 'message': f'Error querying Pinecone: {str(e)}'}), 500
+        matches = [
+            {'id': match.id, 'score': match.score, 'metadata': dict(match.metadata or {})}
+            for match in response.matches
+        ]
+        cache_query_result(key, matches, generation)
+    
+    return jsonify({
+        'success': True,
+        'query': query,
+        'namespace': current_namespace(),
+        'matches': matches,
+        'cached': cached,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/api/query/cache')
+def query_cache_stats():
+    """Hit/miss counters for the query embedding and result caches"""
+    return jsonify({'embeddings': embedding_cache.stats(), 'results': result_cache.stats()})
+
+@app.route('/api/namespaces')
+def get_namespaces():
+    """Namespaces that have a local workspace, and the one selected for this client"""
+    return jsonify({'namespaces': list_namespaces(), 'current': current_namespace(), 'default': default_namespace()})
+
+@app.route('/api/namespace', methods=['POST'])
+def select_namespace():
+    """Switch this client to another namespace; stored in a cookie, no restart needed"""
+    namespace = (request.get_json(silent=True) or {}).get('namespace', '')
+    if not isinstance(namespace, str) or not is_known_namespace(namespace):
+        return jsonify({'success': False, 'message': f'Unknown namespace: {namespace}'}), 404
+
+    response = jsonify({'success': True, 'namespace': namespace})
+    response.set_cookie(NAMESPACE_COOKIE, namespace, max_age=NAMESPACE_COOKIE_MAX_AGE, samesite='Lax')
+    return response
 
 @app.route('/api/clear_namespace', methods=['POST'])
 def clear_namespace():
     """Delete all vectors from the current Pinecone namespace and remove local chunk files and metadata."""
+    error = explicit_namespace_error()
+    if error:
+        return error
+    ws = current_workspace()
     try:
         # Delete all vectors from Pinecone namespace
-        index.delete(delete_all=True, namespace=PINECONE_NAMESPACE)
-        print(f"✅ Cleared all vectors from Pinecone namespace: {PINECONE_NAMESPACE}")
+        index.delete(delete_all=True, namespace=ws.namespace)
+        invalidate_query_results()
+        print(f"✅ Cleared all vectors from Pinecone namespace: {ws.namespace}")
         
         # Optionally, clear local chunk files and metadata
-        for chunk_file in Path(CHUNKS_DIR).glob("*.txt"):
+        for chunk_file in Path(ws.chunks_dir).glob("*.txt"):
             chunk_file.unlink()
-        for meta_file in Path(METADATA_DIR).glob("*.json"):
+        for meta_file in Path(ws.metadata_dir).glob("*.json"):
             meta_file.unlink()
         print("✅ Cleared all local chunk and metadata files")
         
         # Optionally, clear chunk log
-        if os.path.exists("chunklog.db"):
-            os.remove("chunklog.db")
-            print("✅ Removed chunklog.db")
+        if os.path.exists(ws.chunk_log):
+            os.remove(ws.chunk_log)
+            print(f"✅ Removed {ws.chunk_log}")
         
-        return jsonify({'success': True, 'message': f'All chunks cleared from namespace {PINECONE_NAMESPACE} and local storage.'})
+        return jsonify({'success': True, 'message': f'All chunks cleared from namespace {ws.namespace} and local storage.'})
     except Exception as e:
         print(f"❌ Error clearing namespace: {e}")
         return jsonify({'success': False, 'message': f'Error clearing namespace: {str(e)}'}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8080) 
\ No newline at end of file
+    # No debugger here; use start_web_ui.py (with --prod to serve for real)
+    app.run(host='0.0.0.0', port=8080) 
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Per-namespace workspaces: where each Pinecone namespace keeps its chunks,
+metadata and chunk log.
+
+The default namespace (PINECONE_NAMESPACE, or "default") uses the top-level
+`chunks/`, `metadata/` and `chunklog.db`, so single-namespace setups keep
+working unchanged. Every other namespace lives under `workspaces/<namespace>/`.
+"""
+
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+
+# === CONFIG ===
+WORKSPACES_DIR = "workspaces"
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,62}$")
+
+Workspace = namedtuple("Workspace", ["namespace", "chunks_dir", "metadata_dir", "chunk_log"])
+
+
+def default_namespace():
+    # Read at call time so it sees values loaded from .env after import
+    return os.getenv("PINECONE_NAMESPACE", "default")
+
+
+def is_valid_namespace(namespace):
+    return bool(namespace) and NAMESPACE_PATTERN.match(namespace) is not None
+
+
+def workspace(namespace, create=False):
+    """Return the Workspace for `namespace`, creating its directories if asked."""
+    if not is_valid_namespace(namespace):
+        raise ValueError(f"Invalid namespace name: {namespace!r}")
+    if namespace == default_namespace():
+        ws = Workspace(namespace, "chunks", "metadata", "chunklog.db")
+    else:
+        root = Path(WORKSPACES_DIR) / namespace
+        ws = Workspace(namespace, str(root / "chunks"), str(root / "metadata"), str(root / "chunklog.db"))
+    if create:
+        os.makedirs(ws.chunks_dir, exist_ok=True)
+        os.makedirs(ws.metadata_dir, exist_ok=True)
+    return ws
+
+
+def list_namespaces():
+    """The default namespace plus every namespace that has a workspace directory."""
+    namespaces = {default_namespace()}
+    if os.path.isdir(WORKSPACES_DIR):
+        namespaces.update(
+            entry.name for entry in os.scandir(WORKSPACES_DIR)
+            if entry.is_dir() and is_valid_namespace(entry.name)
+        )
+    return sorted(namespaces)